@@ -0,0 +1,143 @@
+import asyncio
+import random
+import re
+from urllib.parse import urljoin
+import aiohttp
+
+_TITLE_RE = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+_HREF_RE = re.compile(r'href="([^"]+)"')
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+class FakeNavigationError(Exception):
+    pass
+
+
+class FakePage:
+    # Enough of the Playwright page API for handlers: goto/content/title/evaluate/inner_text/route;
+    # goto() returns the page itself, standing in for the response (status, headers)
+    def __init__(self, browser):
+        self._browser = browser
+        self._html = ""
+        self.url = "about:blank"
+        self.status = None
+        self.headers = {}
+        self.routes = []
+        self.listeners = []
+
+    async def goto(self, url, wait_until=None, timeout=None):
+        if not self._browser.is_connected():
+            raise FakeNavigationError("Target page, context or browser has been closed")
+        async with self._browser.factory.session().get(url) as response:
+            self._html = await response.text()
+            status = response.status
+            self.headers = {name.lower(): value for name, value in response.headers.items()}
+        self.url = url
+        self.status = status
+        if "/js" in url:
+            await asyncio.sleep(self._browser.factory.js_render_delay)
+        if status >= 500:
+            raise FakeNavigationError(f"HTTP {status} for {url}")
+        return self
+
+    async def content(self):
+        return self._html
+
+    async def title(self):
+        match = _TITLE_RE.search(self._html)
+        return match.group(1) if match else ""
+
+    async def inner_text(self, selector="body"):
+        return " ".join(_TAG_RE.sub(" ", self._html).split())
+
+    async def evaluate(self, script, *args):
+        # The only script handlers in this repo evaluate is "collect absolute links"
+        return [urljoin(self.url, href) for href in _HREF_RE.findall(self._html)]
+
+    async def wait_for_timeout(self, timeout):
+        await asyncio.sleep(timeout / 1000)
+
+    async def route(self, pattern, handler):
+        self.routes.append((pattern, handler))
+
+    def on(self, event, callback):
+        self.listeners.append((event, callback))
+
+    async def close(self):
+        pass
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self._browser = browser
+
+    async def new_page(self):
+        return FakePage(self._browser)
+
+    async def route(self, pattern, handler):
+        pass
+
+    async def close(self):
+        pass
+
+
+class FakeBrowser:
+    def __init__(self, factory):
+        self.factory = factory
+        self._connected = True
+
+    def is_connected(self):
+        return self._connected
+
+    async def new_context(self, **kwargs):
+        if random.random() < self.factory.crash_rate:
+            self._connected = False
+            raise FakeNavigationError("Browser has been closed")
+        return FakeContext(self)
+
+    async def new_page(self, **kwargs):
+        return await (await self.new_context()).new_page()
+
+    async def close(self):
+        self._connected = False
+
+
+class _FakeBrowserManager:
+    def __init__(self, factory, config):
+        self._factory = factory
+        self.config = config
+        self._browser = None
+
+    async def __aenter__(self):
+        await asyncio.sleep(self._factory.launch_delay)
+        self._factory.launches += 1
+        self._browser = FakeBrowser(self._factory)
+        return self._browser
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await asyncio.sleep(self._factory.close_delay)
+        await self._browser.close()
+
+
+class FakeBrowserFactory:
+    # Drop-in for BrowserWorker(browser_factory=...): simulates launch cost and crashes without Camoufox
+    def __init__(self, launch_delay=0.3, close_delay=0.05, js_render_delay=0.2, crash_rate=0.0):
+        self.launch_delay = launch_delay
+        self.close_delay = close_delay
+        self.js_render_delay = js_render_delay
+        self.crash_rate = crash_rate
+        self.launches = 0
+        self._session = None
+
+    def session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0))
+        return self._session
+
+    def __call__(self, **config):
+        return _FakeBrowserManager(self, config)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
@@ -0,0 +1,100 @@
+import asyncio
+from aiohttp import web
+from utils.proxy import FreeProxy
+
+
+def _proxyscrape_payload(count):
+    return {
+        "proxies": [
+            {
+                "alive": True,
+                "ip": f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}",
+                "port": 8080,
+                "protocol": "http",
+                "timeout": 50 + i % 400,
+                "ip_data": {"countryCode": "US"},
+            }
+            for i in range(count)
+        ]
+    }
+
+
+def _geonode_payload(count):
+    return {
+        "data": [
+            {
+                "ip": f"172.16.{i // 256 % 256}.{i % 256}",
+                "port": 3128,
+                "protocols": ["http"],
+                "responseTime": 100 + i % 300,
+                "country": "DE",
+            }
+            for i in range(count)
+        ]
+    }
+
+
+def add_supplier_routes(app, count=200):
+    async def proxyscrape(request):
+        return web.json_response(_proxyscrape_payload(count))
+
+    async def geonode(request):
+        return web.json_response(_geonode_payload(count))
+
+    app.router.add_get("/suppliers/proxyscrape", proxyscrape)
+    app.router.add_get("/suppliers/geonode", geonode)
+    return app
+
+
+def fake_free_proxy(base_url):
+    # Real FreeProxy parsing and merging against the local server; no health checks or disk cache
+    return FreeProxy(
+        validate=False,
+        cache_path=None,
+        suppliers={
+            "proxy_scrape": f"{base_url}/suppliers/proxyscrape",
+            "proxy_geonode": f"{base_url}/suppliers/geonode",
+        },
+    )
+
+
+async def _stand_in_http(reader, writer, behaviour):
+    request = await reader.readuntil(b"\r\n\r\n")
+    if behaviour == "slow":
+        await asyncio.sleep(10)
+    if behaviour == "overlong":
+        # More than the 64 KiB StreamReader limit without a newline
+        writer.write(b"X" * 128 * 1024)
+    elif behaviour == "auth" and b"Proxy-Authorization: Basic dXNlcjpwYXNz" not in request:
+        writer.write(b"HTTP/1.1 407 Proxy Authentication Required\r\nContent-Length: 0\r\n\r\n")
+    elif behaviour == "garbage":
+        writer.write(b"\x00\x01 not http\r\n")
+    else:
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n\r\n{"origin": "127.0.0.1"}')
+
+
+async def _stand_in_socks5(reader, writer):
+    greeting = await reader.readexactly(3)
+    writer.write(b"\x05\x00" if greeting[0] == 5 else b"\x05\xff")
+
+
+async def start_stand_in_proxy(behaviour="ok", protocol="http"):
+    # A local stand-in for a free proxy, answering ProxyChecker's probe the way a real one would (or wouldn't):
+    # ok, auth (needs user:pass), slow, garbage, overlong, reset
+    async def handle(reader, writer):
+        try:
+            if behaviour == "reset":
+                return
+            if protocol == "socks5":
+                await _stand_in_socks5(reader, writer)
+            else:
+                await _stand_in_http(reader, writer, behaviour)
+            await writer.drain()
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.CancelledError):
+            # CancelledError: a slow stand-in still sleeping when the server shuts down
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
@@ -0,0 +1,54 @@
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+# Cumulative import time budgets in ms (median of fresh interpreters); pydantic is most of what's left
+BUDGETS = {
+    "models": 250,
+    "utils.worker": 350,
+    "utils.proxy": 350,
+    "utils.helper": 150,
+    "store": 350,
+}
+# Heavy or optional dependencies that must only load on first use
+LAZY_MODULES = ("camoufox", "browserforge", "urllib3", "openpyxl", "aiohttp", "pyarrow")
+
+
+def measure(module):
+    # -X importtime writes one line per import to stderr; the last one is the requested module, cumulative in us
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR, capture_output=True, text=True, check=True,
+    ).stderr
+    line = [line for line in output.splitlines() if line.startswith("import time:")][-1]
+    return int(line.split("|")[1]) / 1000
+
+
+def eager_imports(module):
+    code = f"import sys, {module}; print(' '.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", code], cwd=SRC_DIR, capture_output=True, text=True, check=True)
+    return output.stdout.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check import times against their budgets")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply budgets, e.g. on slow CI machines")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'module':>14} {'median ms':>10} {'budget ms':>10}  eager")
+    for module, budget in BUDGETS.items():
+        median = statistics.median(measure(module) for _ in range(args.runs))
+        eager = eager_imports(module)
+        over = median > budget * args.scale or eager
+        failed = failed or over
+        print(f"{module:>14} {median:10.1f} {budget * args.scale:10.0f}  {' '.join(eager) or '-'}{'  FAIL' if over else ''}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import asyncio
+import sys
+from bench.fake_proxy import start_stand_in_proxy
+from models import Proxy
+from utils.proxy import ProxyChecker
+
+# (behaviour, protocol, credentials, expected to pass the check)
+CASES = [
+    ("ok", "http", None, True),
+    ("ok", "socks5", None, True),
+    ("auth", "http", ("user", "pass"), True),
+    ("auth", "http", None, False),
+    ("slow", "http", None, False),
+    ("garbage", "http", None, False),
+    ("overlong", "http", None, False),
+    ("reset", "http", None, False),
+    ("closed", "http", None, False),
+]
+
+
+async def _start(behaviour, protocol):
+    if behaviour != "closed":
+        return await start_stand_in_proxy(behaviour, protocol)
+    # A port nothing listens on any more
+    server, port = await start_stand_in_proxy("ok", protocol)
+    server.close()
+    await server.wait_closed()
+    return None, port
+
+
+async def main():
+    # Runs ProxyChecker against local stand-in proxies; run from src: python -m bench.proxy_check
+    servers, proxies = [], []
+    for behaviour, protocol, credentials, _ in CASES:
+        server, port = await _start(behaviour, protocol)
+        servers.append(server)
+        username, password = credentials or (None, None)
+        proxies.append(Proxy(ip="127.0.0.1", port=port, protocol=[protocol], username=username, password=password,
+                             responseTime=0))
+    try:
+        alive = await ProxyChecker(timeout=1.0).filter(proxies)
+    finally:
+        for server in servers:
+            if server is not None:
+                server.close()
+
+    alive_ports = {proxy.port for proxy in alive}
+    failed = False
+    for (behaviour, protocol, credentials, expected), proxy in zip(CASES, proxies):
+        passed = proxy.port in alive_ports
+        failed = failed or passed != expected
+        label = f"{protocol} {behaviour}" + (" with credentials" if credentials else "")
+        print(f"{label:>26} {'alive' if passed else 'dead':>6}{'' if passed == expected else '  FAIL'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,190 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import resource
+import subprocess
+import time
+from pathlib import Path
+from bench.server import make_app, start_server
+from bench.fake_browser import FakeBrowserFactory
+from bench.fake_proxy import add_supplier_routes, fake_free_proxy
+from models import Task
+from utils.concurrency import AdaptiveConcurrency
+from utils.metrics import Metrics
+from utils.proxy import ProxyManager
+from utils.worker import BrowserWorker
+
+RESULTS_DIR = Path(__file__).parent / "results"
+# Geometric buckets from 1 ms to ~2 min (x1.2), fine enough for p50/p99 estimates
+BUCKETS = tuple(0.001 * 1.2 ** i for i in range(65)) + (float("inf"),)
+
+
+async def bench_handle(page, url):
+    await page.goto(url, wait_until="domcontentloaded")
+    return {"url": url, "title": await page.title()}
+
+
+def _workload(base_url, mode, count, seed=7):
+    rng = random.Random(seed)
+    urls = []
+    for i in range(count):
+        roll = rng.random() if mode == "mixed" else 0.0
+        if mode == "slow" or 0.70 <= roll < 0.90:
+            urls.append(f"{base_url}/slow?ms=200&i={i}")
+        elif 0.90 <= roll < 0.95:
+            urls.append(f"{base_url}/fail?p=0.5&i={i}")
+        elif roll >= 0.95:
+            urls.append(f"{base_url}/js?i={i}")
+        else:
+            urls.append(f"{base_url}/fast?i={i}")
+    return urls
+
+
+async def _run(config):
+    app = add_supplier_routes(make_app(), count=config["proxies"])
+    runner, base_url = await start_server(app)
+    factory = FakeBrowserFactory(launch_delay=config["launch_delay"], crash_rate=config["crash_rate"])
+    metrics = Metrics(buckets=BUCKETS)
+    proxy_manager = ProxyManager(fake_free_proxy(base_url)) if config["proxies"] else None
+    worker = BrowserWorker(
+        num_workers=config["num_workers"],
+        max_retries=config["max_retries"],
+        proxy_manager=proxy_manager,
+        pool=config["pool"],
+        fetch_mode=config["fetch_mode"],
+        metrics=metrics,
+        log=False,
+        browser_factory=factory,
+        concurrency=AdaptiveConcurrency(max_workers=config["num_workers"], interval=0.5) if config["adaptive"] else None,
+    )
+    tasks = [Task(handle=bench_handle, args=[url], url=url) for url in _workload(base_url, config["mode"], config["tasks"])]
+    started = time.perf_counter()
+    await worker.run_tasks(tasks)
+    elapsed = time.perf_counter() - started
+
+    results = await worker.get_results()
+    snapshot = metrics.snapshot()
+    histogram = metrics._histograms.get("task_seconds", {})
+    merged = None
+    for series in histogram.values():
+        if merged is None:
+            merged = series
+            continue
+        merged.counts = [a + b for a, b in zip(merged.counts, series.counts)]
+        merged.count += series.count
+        merged.sum += series.sum
+    counters = {
+        item["labels"]["status"]: 0 for item in snapshot["counters"].get("tasks_total", [])
+    }
+    for item in snapshot["counters"].get("tasks_total", []):
+        counters[item["labels"]["status"]] += item["value"]
+
+    if proxy_manager:
+        await proxy_manager.close()
+    await factory.close()
+    await runner.cleanup()
+    return {
+        **config,
+        "elapsed": elapsed,
+        "tasks_per_sec": len(results) / elapsed if elapsed else 0.0,
+        "completed": len(results),
+        "failed": len(worker.get_failed_tasks()),
+        "retries": counters.get("retry", 0),
+        "browser_launches": factory.launches,
+        "p50": merged.quantile(0.5) if merged else 0.0,
+        "p99": merged.quantile(0.99) if merged else 0.0,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def _run_in_process(config):
+    return asyncio.run(_run(config))
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _print_table(rows):
+    print(f"{'workers':>7} {'pool':>5} {'fetch':>8} {'tasks/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'launches':>8} {'retries':>7} {'failed':>6} {'rss MB':>7}")
+    for row in rows:
+        print(
+            f"{row['num_workers']:>7} {str(row['pool']):>5} {row['fetch_mode']:>8} {row['tasks_per_sec']:>9.1f} "
+            f"{row['p50'] * 1000:>8.1f} {row['p99'] * 1000:>8.1f} {row['browser_launches']:>8} "
+            f"{row['retries']:>7} {row['failed']:>6} {row['peak_rss_mb']:>7.1f}"
+        )
+
+
+def _compare(old_path, new_path):
+    old = {(r["num_workers"], r["pool"], r["fetch_mode"]): r for r in json.loads(Path(old_path).read_text())["runs"]}
+    new = json.loads(Path(new_path).read_text())["runs"]
+    for row in new:
+        base = old.get((row["num_workers"], row["pool"], row["fetch_mode"]))
+        if base is None:
+            continue
+        change = (row["tasks_per_sec"] / base["tasks_per_sec"] - 1) * 100 if base["tasks_per_sec"] else 0.0
+        print(
+            f"workers={row['num_workers']:<3} pool={row['pool']!s:<5} fetch={row['fetch_mode']:<8} "
+            f"{base['tasks_per_sec']:.1f} -> {row['tasks_per_sec']:.1f} tasks/s ({change:+.1f}%)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline BrowserWorker benchmark against a local server and a fake browser")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--tasks", type=int, default=300)
+    parser.add_argument("--mode", choices=["fast", "slow", "mixed"], default="mixed")
+    parser.add_argument("--pool", action="store_true")
+    parser.add_argument("--fetch-mode", choices=["browser", "tiered"], default="browser")
+    parser.add_argument("--launch-delay", type=float, default=0.3)
+    parser.add_argument("--crash-rate", type=float, default=0.0)
+    # The fake proxies are not routable, so the HTTP tier can only run without them
+    parser.add_argument("--proxies", type=int, default=None, help="default: 100, or 0 with --fetch-mode tiered")
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--adaptive", action="store_true", help="grow/shrink active workers up to --workers")
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args()
+
+    if args.compare:
+        _compare(*args.compare)
+        return
+
+    configs = [
+        {
+            "num_workers": num_workers,
+            "tasks": args.tasks,
+            "mode": args.mode,
+            "pool": args.pool,
+            "fetch_mode": args.fetch_mode,
+            "launch_delay": args.launch_delay,
+            "crash_rate": args.crash_rate,
+            "proxies": args.proxies if args.proxies is not None else (0 if args.fetch_mode == "tiered" else 100),
+            "max_retries": args.max_retries,
+            "adaptive": args.adaptive,
+        }
+        for num_workers in args.workers
+    ]
+    # One fresh process per configuration keeps peak RSS comparable
+    context = multiprocessing.get_context("spawn")
+    rows = []
+    for config in configs:
+        with context.Pool(1) as pool:
+            rows.append(pool.apply(_run_in_process, (config,)))
+    _print_table(rows)
+
+    if not args.no_save:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        revision = _git_revision()
+        path = RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{revision}.json"
+        path.write_text(json.dumps({"revision": revision, "runs": rows}, indent=2))
+        print(f"Saved {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import asyncio
+import random
+from aiohttp import web
+
+_PAGE = "<html><head><title>{title}</title></head><body>{body}</body></html>"
+
+
+def _links(request, count=5):
+    n = int(request.match_info.get("n", 0))
+    return "".join(f'<a href="/page/{n * count + i + 1}">page {n * count + i + 1}</a>' for i in range(count))
+
+
+def _text(words=300):
+    return " ".join("lorem" for _ in range(words))
+
+
+async def fast(request):
+    return web.Response(text=_PAGE.format(title="fast", body=_text() + _links(request)), content_type="text/html")
+
+
+async def slow(request):
+    await asyncio.sleep(int(request.query.get("ms", 500)) / 1000)
+    return web.Response(text=_PAGE.format(title="slow", body=_text() + _links(request)), content_type="text/html")
+
+
+async def fail(request):
+    # ?p= is the failure probability, so retries eventually succeed
+    if random.random() < float(request.query.get("p", 1.0)):
+        return web.Response(status=500, text="boom")
+    return web.Response(text=_PAGE.format(title="flaky", body=_text()), content_type="text/html")
+
+
+async def js(request):
+    body = '<noscript>Please enable JavaScript to continue</noscript><div id="app"></div><script src="/static/app.js"></script>'
+    return web.Response(text=_PAGE.format(title="js", body=body), content_type="text/html")
+
+
+async def page(request):
+    n = request.match_info["n"]
+    return web.Response(text=_PAGE.format(title=f"page {n}", body=_text() + _links(request)), content_type="text/html")
+
+
+async def static(request):
+    return web.Response(body=b"/*" + b"x" * 50_000 + b"*/", content_type="application/javascript")
+
+
+def make_app():
+    app = web.Application()
+    app.router.add_get("/fast", fast)
+    app.router.add_get("/slow", slow)
+    app.router.add_get("/fail", fail)
+    app.router.add_get("/js", js)
+    app.router.add_get("/page/{n}", page)
+    app.router.add_get("/static/{name}", static)
+    return app
+
+
+async def start_server(app=None, host="127.0.0.1", port=0):
+    runner = web.AppRunner(app or make_app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://{host}:{port}"
@@ -3,12 +3,11 @@ import asyncio
 import uuid
 from utils.worker import BrowserWorker
 from utils.proxy import ProxyManager
+from utils.frontier import emit, current_task
+from utils.urls import UrlSet
 from models import Task
 
-async def crawl_page(page, url, depth=0, max_depth=2):
-    if depth > max_depth:
-        return {"url": url, "links": [], "depth": depth}
-    
+async def crawl_page(page, url):
     await page.goto(url, wait_until="networkidle")
     
     title = await page.title()
@@ -19,12 +18,16 @@ async def crawl_page(page, url, depth=0, max_depth=2):
     }''')
     
     unique_links = list(set(links))[:5] 
+
+    # The worker enforces max_depth, so links past the last level are dropped by the engine
+    for link in unique_links:
+        emit(crawl_page, [link], url=link)
     
     return {
         "url": url,
         "title": title,
         "links": unique_links,
-        "depth": depth
+        "depth": current_task().depth
     }
 
 async def main():
@@ -34,36 +37,22 @@ async def main():
         num_workers=5,
         max_retries=10,
         show_browser=True,
+        max_depth=2,
+        seen=UrlSet(),
     )
     
     start_urls = ["https://example.com", "https://wikipedia.org"]
     
     initial_tasks = [
-        Task(id=f"task_{uuid.uuid4()}", handle=crawl_page, args=[url, 0, 2])
+        Task(id=f"task_{uuid.uuid4()}", handle=crawl_page, args=[url], url=url)
         for url in start_urls
     ]
     
+    # Runs until the frontier is empty; links emitted by crawl_page are queued while workers are running
     await worker.run_tasks(initial_tasks)
     
     results = await worker.get_results()
     
-    next_level_tasks = []
-    for result in results:
-        for link in result.get("links", []):
-            next_level_tasks.append(
-                Task(
-                    id=f"task_{uuid.uuid4()}", 
-                    handle=crawl_page, 
-                    args=(link, result["depth"] + 1, 2)
-                )
-            )
-    
-    if next_level_tasks:
-        await worker.run_tasks(next_level_tasks)
-        
-        next_results = await worker.get_results()
-        results.extend(next_results)
-    
     for result in results:
         print(f"URL: {result['url']}")
         print(f"Title: {result.get('title', 'N/A')}")
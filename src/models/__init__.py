@@ -1,11 +1,50 @@
 from pydantic import BaseModel, Field
-from typing import Callable, Any, List, Set, Literal, Optional
+from typing import Callable, Any, Dict, List, Set, Literal, Optional
+import importlib
+import json
 import uuid
 
+_handles = {}
+
+
+def _resolve_handle(ref):
+    handle = _handles.get(ref)
+    if handle is None:
+        module_name, qualname = ref.split(":", 1)
+        handle = importlib.import_module(module_name)
+        for attr in qualname.split("."):
+            handle = getattr(handle, attr)
+        _handles[ref] = handle
+    return handle
+
 class Task(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4())[:8])
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     handle: Callable[..., Any]
     args: List[Any]
+    url: Optional[str] = None
+    depth: int = 0
+    parent_id: Optional[str] = None
+    attempts: int = 0
+    # Retries so far per utils.retry.ErrorClass value; each class is held to its own RetryPolicy budget
+    attempts_by_class: Dict[str, int] = Field(default_factory=dict)
+    needs_browser: bool = False
+    # InterceptPolicy keyword overrides for this task, e.g. {"block_resources": ["image", "font"]}
+    intercept: Optional[dict] = None
+    # Seconds before the engine cancels the task; soft_timeout returns the handler's partial() result instead
+    timeout: Optional[float] = None
+    soft_timeout: Optional[float] = None
+    # Used by utils.scheduler.PriorityScheduler: higher priority runs first, groups share workers by weight
+    priority: float = 0.0
+    group: Optional[str] = None
+
+    # Handles travel as "module:qualname" so tasks can be persisted or sent to another process
+    def to_record(self):
+        handle_ref = f"{self.handle.__module__}:{self.handle.__qualname__}"
+        return handle_ref, json.dumps(self.model_dump(exclude={"handle"}))
+
+    @classmethod
+    def from_record(cls, handle_ref, payload):
+        return cls(handle=_resolve_handle(handle_ref), **json.loads(payload))
 
 class Proxy(BaseModel):
     ip: str
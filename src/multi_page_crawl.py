@@ -2,13 +2,14 @@
 import asyncio
 import uuid
 from utils.worker import BrowserWorker
-from utils.proxy import ProxyManager
+from utils.proxy import FreeProxy, ProxyManager
+from utils.network import AsyncHttpClient
+from utils.frontier import emit, current_task
+from utils.urls import UrlSet
+from utils.intercept import InterceptPolicy
 from models import Task
 
-async def crawl_page(page, url, depth=0, max_depth=2):
-    if depth > max_depth:
-        return {"url": url, "links": [], "depth": depth}
-    
+async def crawl_page(page, url):
     await page.goto(url, wait_until="networkidle")
     
     title = await page.title()
@@ -19,52 +20,51 @@ async def crawl_page(page, url, depth=0, max_depth=2):
     }''')
     
     unique_links = list(set(links))[:5] 
+
+    # The worker enforces max_depth, so links past the last level are dropped by the engine
+    for link in unique_links:
+        emit(crawl_page, [link], url=link)
     
     return {
         "url": url,
         "title": title,
         "links": unique_links,
-        "depth": depth
+        "depth": current_task().depth
     }
 
 async def main():
-    proxy_manager = ProxyManager()
+    # One connection pool for the proxy suppliers and the worker's plain HTTP requests
+    http_client = AsyncHttpClient(limit=50, limit_per_host=10, retries=2)
+    proxy_manager = ProxyManager(FreeProxy(client=http_client))
     
     worker = BrowserWorker(
         num_workers=5,
         max_retries=10,
         show_browser=True,
-        proxy_manager=proxy_manager
+        max_depth=2,
+        seen=UrlSet(),
+        # Skips images, media, fonts and trackers so "networkidle" isn't held up by them
+        intercept=InterceptPolicy(),
+        proxy_manager=proxy_manager,
+        http_client=http_client,
     )
     
     start_urls = ["https://example.com", "https://wikipedia.org"]
     
     initial_tasks = [
-        Task(id=f"task_{uuid.uuid4()}", handle=crawl_page, args=[url, 0, 2])
+        Task(id=f"task_{uuid.uuid4()}", handle=crawl_page, args=[url], url=url)
         for url in start_urls
     ]
     
-    await worker.run_tasks(initial_tasks)
+    # Runs until the frontier is empty; links emitted by crawl_page are queued while workers are running
+    try:
+        await worker.run_tasks(initial_tasks)
+    finally:
+        await proxy_manager.close()
+        await http_client.close()
     
     results = await worker.get_results()
     
-    next_level_tasks = []
-    for result in results:
-        for link in result.get("links", []):
-            next_level_tasks.append(
-                Task(
-                    id=f"task_{uuid.uuid4()}", 
-                    handle=crawl_page, 
-                    args=(link, result["depth"] + 1, 2)
-                )
-            )
-    
-    if next_level_tasks:
-        await worker.run_tasks(next_level_tasks)
-        
-        next_results = await worker.get_results()
-        results.extend(next_results)
-    
     for result in results:
         print(f"URL: {result['url']}")
         print(f"Title: {result.get('title', 'N/A')}")
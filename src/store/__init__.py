@@ -1,5 +1,7 @@
 import asyncio
 from typing import List, Any, Optional
+from store.sqlite import SqliteStore
+from store.recrawl import RecrawlIndex
 
 class Store:
     def __init__(self):
@@ -42,7 +44,7 @@ class Store:
     def has_results(self) -> bool:
         return not self.result_queue.empty()
     
-    def task_done(self):
+    def task_done(self, task=None):
         self.task_queue.task_done()
         
     async def wait_for_completion(self):
@@ -53,9 +55,8 @@ class Store:
             await asyncio.sleep(2)
     def is_clean(self):
         return self.task_queue.empty() and self.result_queue.empty()
-  
-# Create a global store instance
-task_store = Store()
+
+
 
 
 
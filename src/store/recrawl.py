@@ -0,0 +1,153 @@
+import hashlib
+import heapq
+import math
+import sqlite3
+import time
+from utils.fetch import visible_text
+from utils.seeds import SeedSource
+from utils.urls import canonicalize_url
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    content_hash TEXT,
+    checks INTEGER NOT NULL DEFAULT 0,
+    changes INTEGER NOT NULL DEFAULT 0,
+    first_checked REAL NOT NULL,
+    last_checked REAL NOT NULL,
+    last_changed REAL
+);
+"""
+
+
+def content_hash(html):
+    # Hash of the visible text, so markup-only churn (nonces, timestamps in attributes) doesn't count as a change
+    return hashlib.blake2b(visible_text(html).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def change_rate(changes, observed_seconds, prior_rate):
+    # Changes per second: Poisson rate with a gamma prior worth one change per 1/prior_rate seconds,
+    # so new pages start at prior_rate and pages that never change still drift back into the revisit order
+    return (changes + 1) / (observed_seconds + 1 / prior_rate)
+
+
+class PageCheck:
+    __slots__ = ("url", "status", "etag", "last_modified", "content_hash", "unchanged")
+
+    def __init__(self, url, status, etag, last_modified, content_hash, unchanged):
+        self.url = url
+        self.status = status
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_hash = content_hash
+        self.unchanged = unchanged
+
+
+class RecrawlIndex:
+    # Per-URL validators, content hash and change history for incremental recrawls
+    def __init__(self, path="recrawl.db", prior_rate=1 / 86400):
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        # Assumed change rate (per second) before a URL has any history
+        self._prior_rate = prior_rate
+
+    def _row(self, url):
+        return self._db.execute(
+            "SELECT etag, last_modified, content_hash FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+
+    def known(self, url):
+        # Only URLs with a stored validator or hash are worth a conditional GET before rendering
+        row = self._row(canonicalize_url(url))
+        return row is not None and any(value is not None for value in row)
+
+    def _page_check(self, key, row, status, headers, html):
+        digest = content_hash(html)
+        unchanged = status == 200 and row is not None and row[2] == digest
+        headers = {name.lower(): value for name, value in headers.items()}
+        return PageCheck(key, status, headers.get("etag"), headers.get("last-modified"), digest, unchanged)
+
+    async def check(self, client, url, proxy=None, headers=None):
+        # Conditional GET; a 304 or an unchanged text hash means the page doesn't need rendering
+        key = canonicalize_url(url)
+        row = self._row(key)
+        request_headers = dict(headers or {})
+        if row is not None:
+            etag, last_modified, _ = row
+            if etag:
+                request_headers["If-None-Match"] = etag
+            if last_modified:
+                request_headers["If-Modified-Since"] = last_modified
+        html, status, response_headers = await client.get(
+            url, headers=request_headers, proxy=proxy, with_headers=True
+        )
+        if status == 304 and row is not None:
+            return PageCheck(key, status, row[0], row[1], row[2], True)
+        return self._page_check(key, row, status, response_headers, html)
+
+    def observe(self, url, status, headers, html):
+        # Validators and hash taken from the render's own response, so a page is only downloaded once
+        if status != 200:
+            return None
+        key = canonicalize_url(url)
+        return self._page_check(key, self._row(key), status, headers, html)
+
+    def commit(self, check: PageCheck, now=None):
+        # Called once the page is handled (or skipped), so a failed handler leaves the old state for its retry
+        now = now or time.time()
+        changed = 0 if check.unchanged else 1
+        self._db.execute(
+            "INSERT INTO pages (url, etag, last_modified, content_hash, checks, changes, first_checked, "
+            "last_checked, last_changed) VALUES (?, ?, ?, ?, 1, 0, ?, ?, ?) "
+            "ON CONFLICT(url) DO UPDATE SET etag=excluded.etag, last_modified=excluded.last_modified, "
+            "content_hash=excluded.content_hash, checks=checks+1, changes=changes+?, "
+            "last_checked=excluded.last_checked, "
+            "last_changed=CASE WHEN ? THEN excluded.last_checked ELSE last_changed END",
+            (check.url, check.etag, check.last_modified, check.content_hash, now, now, now, changed, changed),
+        )
+
+    def priority(self, changes, first_checked, last_checked, now=None):
+        # Probability the page changed since it was last checked, assuming changes arrive as a Poisson process
+        now = now or time.time()
+        rate = change_rate(changes, last_checked - first_checked, self._prior_rate)
+        return 1 - math.exp(-rate * (now - last_checked))
+
+    def revisit_urls(self, limit=None, min_priority=0.0, now=None):
+        now = now or time.time()
+        scored = (
+            (self.priority(changes, first, last, now), url)
+            for url, changes, first, last in self._db.execute(
+                "SELECT url, changes, first_checked, last_checked FROM pages"
+            )
+        )
+        scored = (entry for entry in scored if entry[0] > min_priority)
+        ordered = heapq.nlargest(limit, scored) if limit else sorted(scored, reverse=True)
+        return [url for _, url in ordered]
+
+    def revisits(self, limit=None, min_priority=0.0):
+        return RevisitSeeds(self, limit, min_priority)
+
+    def stats(self):
+        pages, checks, changes = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(checks), 0), COALESCE(SUM(changes), 0) FROM pages"
+        ).fetchone()
+        return {"pages": pages, "checks": checks, "changes": changes}
+
+    def close(self):
+        self._db.close()
+
+
+class RevisitSeeds(SeedSource):
+    # Known URLs, most likely to have changed first; feed to worker.run_seeds()
+    def __init__(self, index: RecrawlIndex, limit=None, min_priority=0.0):
+        self._index = index
+        self._limit = limit
+        self._min_priority = min_priority
+
+    async def urls(self):
+        for url in self._index.revisit_urls(self._limit, self._min_priority):
+            yield url
@@ -0,0 +1,267 @@
+import asyncio
+import json
+import sqlite3
+import time
+from collections import deque
+from typing import Any, List, Optional
+from models import Task
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    handle TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    lease_until REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_status_seq ON tasks (status, seq);
+CREATE TABLE IF NOT EXISTS results (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload TEXT NOT NULL,
+    consumed INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+class SqliteStore:
+    def __init__(self, path="crawl.db", lease_seconds=300, claim_batch=64, poll_interval=1.0):
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._lease_seconds = lease_seconds
+        self._claim_batch = claim_batch
+        self._poll_interval = poll_interval
+
+        # Writes are buffered and committed together once per event-loop tick
+        self._pending_writes = []
+        self._pending_results = []
+        self._flush_scheduled = False
+
+        self._ready = deque()
+        self._inflight = set()
+        self._requeued = set()
+        self._failed = set()
+        self._wakeup = asyncio.Event()
+        self._finished = asyncio.Event()
+        # Resume from checkpoint: anything not done or failed in a previous run is still unfinished
+        self._unfinished = self._db.execute(
+            "SELECT COUNT(*) FROM tasks WHERE status IN ('pending', 'leased')"
+        ).fetchone()[0]
+        if self._unfinished == 0:
+            self._finished.set()
+
+    def _serialize(self, task: Task):
+        return (task.id, *task.to_record())
+
+    def _upsert(self, rows):
+        # put_nowait counted every put; uncount the ones that don't add work, i.e. the row is already pending,
+        # or leased by a run that's still counted (another process's lease, or claimed here but not started)
+        for task_id, handle_ref, payload, inflight in rows:
+            row = self._db.execute("SELECT status FROM tasks WHERE id=?", (task_id,)).fetchone()
+            if row is not None and (row[0] == "pending" or (row[0] == "leased" and not inflight)):
+                self._unfinished -= 1
+            self._db.execute(
+                "INSERT INTO tasks (id, handle, payload) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET handle=excluded.handle, payload=excluded.payload, "
+                "status='pending', lease_until=NULL",
+                (task_id, handle_ref, payload),
+            )
+
+    def _schedule_flush(self):
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+
+    def flush(self):
+        self._flush_scheduled = False
+        if not self._pending_writes and not self._pending_results:
+            return
+        writes, self._pending_writes = self._pending_writes, []
+        results, self._pending_results = self._pending_results, []
+        with self._db:
+            self._db.execute("BEGIN")
+            for op, rows in _group_ops(writes):
+                if op == "upsert":
+                    self._upsert(rows)
+                elif op == "done":
+                    self._db.executemany("UPDATE tasks SET status='done', lease_until=NULL WHERE id=?", rows)
+                elif op == "failed":
+                    self._db.executemany(
+                        "UPDATE tasks SET status='failed', lease_until=NULL, error=? WHERE id=?", rows
+                    )
+            if results:
+                self._db.executemany("INSERT INTO results (payload) VALUES (?)", results)
+        if self._unfinished == 0:
+            self._finished.set()
+
+    def _claim(self):
+        self.flush()
+        now = time.time()
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            rows = self._db.execute(
+                "SELECT seq, id, handle, payload FROM tasks "
+                "WHERE status='pending' OR (status='leased' AND lease_until < ?) "
+                "ORDER BY seq LIMIT ?",
+                (now, self._claim_batch + len(self._inflight)),
+            ).fetchall()
+            rows = [row for row in rows if row[1] not in self._inflight][:self._claim_batch]
+            self._db.executemany(
+                "UPDATE tasks SET status='leased', lease_until=? WHERE seq=?",
+                [(now + self._lease_seconds, row[0]) for row in rows],
+            )
+        for _, task_id, handle_ref, payload in rows:
+            self._ready.append(Task.from_record(handle_ref, payload))
+
+    # Queue interface used by BrowserWorker
+
+    def put_nowait(self, task: Task):
+        inflight = task.id in self._inflight
+        if inflight:
+            self._requeued.add(task.id)
+        elif any(ready.id == task.id for ready in self._ready):
+            # Claimed but not started: the new version replaces it and is claimed again
+            self._ready = deque(ready for ready in self._ready if ready.id != task.id)
+        self._pending_writes.append(("upsert", (*self._serialize(task), inflight)))
+        self._unfinished += 1
+        self._finished.clear()
+        self._wakeup.set()
+        self._schedule_flush()
+
+    async def put(self, task: Task):
+        self.put_nowait(task)
+
+    async def get(self) -> Task:
+        while True:
+            self._wakeup.clear()
+            if not self._ready:
+                self._claim()
+            if self._ready:
+                task = self._ready.popleft()
+                self._inflight.add(task.id)
+                return task
+            # Leases held by a dead process only become claimable once they expire, so poll as well
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def task_done(self, task: Task = None):
+        if task is not None:
+            self._inflight.discard(task.id)
+            if task.id in self._requeued:
+                self._requeued.discard(task.id)
+            elif task.id in self._failed:
+                self._failed.discard(task.id)
+            else:
+                self._pending_writes.append(("done", (task.id,)))
+                self._schedule_flush()
+        if self._unfinished <= 0:
+            raise ValueError("task_done() called too many times")
+        self._unfinished -= 1
+        if self._unfinished == 0:
+            self._finished.set()
+        self._wakeup.set()
+
+    def fail(self, task: Task, error: str):
+        self._failed.add(task.id)
+        self._pending_writes.append(("failed", (error, task.id)))
+        self._schedule_flush()
+
+    async def join(self):
+        await self._finished.wait()
+
+    def qsize(self):
+        return self._unfinished - len(self._inflight)
+
+    def empty(self):
+        return self.qsize() <= 0
+
+    # Store API
+
+    async def add_task(self, task: Task):
+        await self.put(task)
+
+    async def get_task(self) -> Optional[Task]:
+        if self.empty():
+            return None
+        return await self.get()
+
+    async def get_tasks(self) -> List[Task]:
+        tasks = []
+        while not self.empty():
+            tasks.append(await self.get())
+        return tasks
+
+    async def add_result(self, result):
+        self._pending_results.append((json.dumps(result, default=str),))
+        self._schedule_flush()
+
+    def _consume_results(self, limit=None):
+        self.flush()
+        query = "SELECT seq, payload FROM results WHERE consumed=0 ORDER BY seq"
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        with self._db:
+            self._db.execute("BEGIN")
+            rows = self._db.execute(query).fetchall()
+            self._db.executemany("UPDATE results SET consumed=1 WHERE seq=?", [(row[0],) for row in rows])
+        return [json.loads(row[1]) for row in rows]
+
+    async def get_results(self) -> List[Any]:
+        return self._consume_results()
+
+    async def get_result(self) -> Optional[Any]:
+        results = self._consume_results(limit=1)
+        return results[0] if results else None
+
+    def get_failed_tasks(self):
+        self.flush()
+        rows = self._db.execute(
+            "SELECT handle, payload, error FROM tasks WHERE status='failed' ORDER BY seq"
+        ).fetchall()
+        return [(Task.from_record(handle_ref, payload), error) for handle_ref, payload, error in rows]
+
+    def has_tasks(self) -> bool:
+        return not self.empty()
+
+    def has_results(self) -> bool:
+        self.flush()
+        return self._db.execute("SELECT 1 FROM results WHERE consumed=0 LIMIT 1").fetchone() is not None
+
+    async def wait_for_completion(self):
+        await self.join()
+
+    async def wait_for_clean(self):
+        while not self.is_clean():
+            await asyncio.sleep(2)
+
+    def is_clean(self):
+        return self.empty() and not self.has_results()
+
+    def close(self):
+        self.flush()
+        # Prefetched but unstarted tasks go straight back to pending instead of waiting out their lease
+        if self._ready:
+            with self._db:
+                self._db.execute("BEGIN")
+                self._db.executemany(
+                    "UPDATE tasks SET status='pending', lease_until=NULL WHERE id=?",
+                    [(task.id,) for task in self._ready],
+                )
+            self._ready.clear()
+        self._db.close()
+
+
+def _group_ops(writes):
+    # Collapse consecutive writes of the same kind into one executemany, keeping their order
+    grouped = []
+    for op, row in writes:
+        if grouped and grouped[-1][0] == op:
+            grouped[-1][1].append(row)
+        else:
+            grouped.append((op, [row]))
+    return grouped
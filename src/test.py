@@ -21,7 +21,10 @@ async def main():
     tasks=[]
     for url in urls:
         tasks.append(Task(handle=task_handle,args=[url]))
-    await worker.run_tasks(tasks)
+    try:
+        await worker.run_tasks(tasks)
+    finally:
+        await proxy_manager.close()
     res =await worker.get_results()
     print(res) 
 
@@ -0,0 +1,211 @@
+import asyncio
+import email.utils
+import json
+import re
+import sqlite3
+import threading
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+"""
+
+STATIC_RESOURCES = ("script", "stylesheet", "font", "image")
+# Headers that describe the wire encoding rather than the body we hand back
+_HOP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "keep-alive"}
+_MAX_AGE_RE = re.compile(r"(?:s-maxage|max-age)\s*=\s*(\d+)")
+
+
+def _parse_http_date(value):
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def freshness_lifetime(headers, now=None):
+    # Seconds a response may be reused for per RFC 9111, or None when it must not be stored
+    now = now or time.time()
+    cache_control = headers.get("cache-control", "").lower()
+    if "no-store" in cache_control or "no-cache" in cache_control or "private" in cache_control:
+        return None
+    ages = [int(age) for age in _MAX_AGE_RE.findall(cache_control)]
+    if ages:
+        return max(ages) or None
+    expires = _parse_http_date(headers.get("expires"))
+    if expires is not None:
+        return expires - now if expires > now else None
+    # Heuristic freshness: 10% of the time since the resource last changed
+    last_modified = _parse_http_date(headers.get("last-modified"))
+    if last_modified is not None and last_modified < now:
+        return (now - last_modified) / 10
+    return None
+
+
+class ResourceCache:
+    # Size-bounded LRU of GET responses in one SQLite file (WAL), so workers and shard processes can share it
+    def __init__(self, path=".resource_cache.db", max_bytes=512 * 1024 * 1024, resource_types=STATIC_RESOURCES,
+                 max_entry_bytes=10 * 1024 * 1024, cache_documents=False, document_ttl=3600):
+        self._path = path
+        self._conn = None
+        # SQLite work runs in worker threads (get_async/put_async) so a busy or large cache never stalls the event loop
+        self._lock = threading.Lock()
+        self._size = None
+        self._max_bytes = max_bytes
+        self._max_entry_bytes = max_entry_bytes
+        self._resource_types = frozenset(resource_types)
+        # Whole documents are cached for document_ttl regardless of their headers; meant for development re-runs
+        self._cache_documents = cache_documents
+        self._document_ttl = document_ttl
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.bytes_served = 0
+
+    @property
+    def _db(self):
+        # Opened on first use so the cache can be pickled into shard processes
+        if self._conn is None:
+            self._conn = sqlite3.connect(self._path, isolation_level=None, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def __getstate__(self):
+        return {**self.__dict__, "_conn": None, "_size": None, "_lock": None}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state, _lock=threading.Lock())
+
+    def _total_size(self):
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def wants(self, resource_type):
+        return resource_type in self._resource_types or (self._cache_documents and resource_type == "document")
+
+    def get(self, url):
+        with self._lock:
+            return self._get(url)
+
+    def _get(self, url):
+        now = time.time()
+        row = self._db.execute(
+            "SELECT status, headers, body FROM entries WHERE url = ? AND expires > ?", (url, now)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self._db.execute("UPDATE entries SET last_access = ? WHERE url = ?", (now, url))
+        self.hits += 1
+        self.bytes_served += len(row[2])
+        return row[0], json.loads(row[1]), row[2]
+
+    def put(self, url, status, headers, body, resource_type):
+        with self._lock:
+            return self._put(url, status, headers, body, resource_type)
+
+    async def get_async(self, url):
+        return await asyncio.to_thread(self.get, url)
+
+    async def put_async(self, url, status, headers, body, resource_type):
+        return await asyncio.to_thread(self.put, url, status, headers, body, resource_type)
+
+    def _put(self, url, status, headers, body, resource_type):
+        if status != 200 or len(body) > self._max_entry_bytes:
+            return False
+        headers = {name.lower(): value for name, value in headers.items()}
+        now = time.time()
+        if resource_type == "document" and self._cache_documents:
+            ttl = self._document_ttl
+        else:
+            ttl = freshness_lifetime(headers, now)
+        if not ttl:
+            return False
+        headers = {name: value for name, value in headers.items() if name not in _HOP_HEADERS}
+        self._db.execute(
+            "INSERT OR REPLACE INTO entries (url, status, headers, body, size, expires, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (url, status, json.dumps(headers), body, len(body), now + ttl, now),
+        )
+        self.stores += 1
+        # Running total from this process only; other processes' writes are picked up when it's recounted
+        self._size = (self._total_size() if self._size is None else self._size) + len(body)
+        if self._size > self._max_bytes:
+            self._evict()
+        return True
+
+    def _evict(self):
+        # Drop expired entries first, then least recently used ones down to 90% of the budget
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            self.evictions += self._db.execute("DELETE FROM entries WHERE expires <= ?", (time.time(),)).rowcount
+            total = self._total_size()
+            target = self._max_bytes * 0.9
+            # Walks the last_access index only as far as needed instead of loading every entry
+            victims = []
+            for url, size in self._db.execute("SELECT url, size FROM entries ORDER BY last_access"):
+                if total <= target:
+                    break
+                victims.append((url,))
+                total -= size
+            self._db.executemany("DELETE FROM entries WHERE url = ?", victims)
+            self.evictions += len(victims)
+        self._size = total
+
+    async def handle_route(self, route):
+        request = route.request
+        if request.method != "GET" or not self.wants(request.resource_type):
+            await route.fallback()
+            return
+        cached = await self.get_async(request.url)
+        if cached is not None:
+            status, headers, body = cached
+            await route.fulfill(status=status, headers=headers, body=body)
+            return
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception:
+            # Hand the request back so the browser fails (or retries) it the normal way instead of leaving it hanging
+            try:
+                await route.fallback()
+            except Exception:
+                pass
+            return
+        await self.put_async(request.url, response.status, response.headers, body, request.resource_type)
+        # response.body() is already decoded, so the wire encoding headers can't be passed along
+        headers = {name: value for name, value in response.headers.items() if name.lower() not in _HOP_HEADERS}
+        await route.fulfill(status=response.status, headers=headers, body=body)
+
+    async def install(self, page):
+        await page.route("**/*", self.handle_route)
+
+    def stats(self):
+        with self._lock:
+            size, entries = self._db.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM entries").fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "bytes_served": self.bytes_served,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,82 @@
+import os
+from collections import deque
+
+
+def cpu_load():
+    # 1-minute load average per core; None where the platform can't tell us
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        pass
+    try:
+        import psutil
+        return psutil.cpu_percent(interval=None) / 100
+    except ImportError:
+        return None
+
+
+def free_memory():
+    # Available memory in bytes; None where the platform can't tell us
+    try:
+        with open("/proc/meminfo") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        return None
+
+
+class AdaptiveConcurrency:
+    # AIMD: add `increase` workers while healthy, multiply by `decrease_factor` when any signal is over budget
+    def __init__(self, min_workers=1, max_workers=20, initial=None, target_latency=None, max_error_rate=0.3,
+                 max_cpu_load=0.9, min_free_memory=512 * 1024 * 1024, increase=1, decrease_factor=0.7,
+                 interval=5.0, window=50, min_samples=5):
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.limit = initial or min_workers
+        self.interval = interval
+        self._target_latency = target_latency
+        self._max_error_rate = max_error_rate
+        self._max_cpu_load = max_cpu_load
+        self._min_free_memory = min_free_memory
+        self._increase = increase
+        self._decrease_factor = decrease_factor
+        self._min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self.last_reason = None
+
+    def record(self, latency, ok):
+        self._samples.append((latency, ok))
+
+    def _overload_reason(self):
+        if self._samples:
+            errors = sum(1 for _, ok in self._samples if not ok)
+            if len(self._samples) >= self._min_samples and errors / len(self._samples) > self._max_error_rate:
+                return "error_rate"
+            if self._target_latency:
+                latencies = sorted(latency for latency, ok in self._samples if ok)
+                if latencies and latencies[len(latencies) // 2] > self._target_latency:
+                    return "latency"
+        load = cpu_load()
+        if load is not None and self._max_cpu_load and load > self._max_cpu_load:
+            return "cpu"
+        available = free_memory()
+        if available is not None and self._min_free_memory and available < self._min_free_memory:
+            return "memory"
+        return None
+
+    def adjust(self):
+        reason = self._overload_reason()
+        if reason:
+            self.limit = max(self.min_workers, int(self.limit * self._decrease_factor))
+            # Start the next window fresh so one bad burst doesn't cut the limit twice
+            self._samples.clear()
+        elif len(self._samples) >= self._min_samples:
+            self.limit = min(self.max_workers, self.limit + self._increase)
+        self.last_reason = reason
+        return self.limit
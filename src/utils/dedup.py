@@ -0,0 +1,118 @@
+import hashlib
+import re
+from collections import Counter
+from urllib.parse import urlsplit, parse_qsl
+from utils.urls import get_host
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_NUMBER_RE = re.compile(r"\d+")
+_BYTES_WITH_BIT = [[value for value in range(256) if value >> bit & 1] for bit in range(8)]
+
+
+def _feature_hash(feature):
+    return hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+
+
+def simhash(text, shingle=3):
+    # 64-bit SimHash over word shingles; near-identical texts differ in only a few bits
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < shingle:
+        features = Counter(words)
+    else:
+        features = Counter(" ".join(words[i:i + shingle]) for i in range(len(words) - shingle + 1))
+    # Weights are tallied per (byte position, byte value) so each feature costs 8 additions instead of 64
+    tallies = [[0] * 256 for _ in range(8)]
+    total = 0
+    for feature, weight in features.items():
+        total += weight
+        for position, byte in enumerate(_feature_hash(feature)):
+            tallies[position][byte] += weight
+    fingerprint = 0
+    for position, tally in enumerate(tallies):
+        for bit, values in enumerate(_BYTES_WITH_BIT):
+            if 2 * sum(tally[value] for value in values) > total:
+                fingerprint |= 1 << (position * 8 + bit)
+    return fingerprint
+
+
+def url_pattern(url):
+    # Numbers become {n} and query values are dropped: /list?page=7&sid=abc -> host/list?page&sid
+    parts = urlsplit(url)
+    path = _NUMBER_RE.sub("{n}", parts.path or "/")
+    keys = sorted({key for key, _ in parse_qsl(parts.query, keep_blank_values=True)})
+    return f"{get_host(url)}{path}" + ("?" + "&".join(keys) if keys else "")
+
+
+class NearDuplicateIndex:
+    # SimHash fingerprints in an LSH index: split into max_distance + 1 bands, any fingerprint within
+    # max_distance bits shares at least one band exactly (pigeonhole), so only same-band entries are compared
+    def __init__(self, max_distance=3, min_words=50, learn_patterns=True, pattern_min_samples=20,
+                 pattern_duplicate_ratio=0.9):
+        self._max_distance = max_distance
+        self._bands = max_distance + 1
+        self._band_bits = 64 // self._bands
+        self._band_mask = (1 << self._band_bits) - 1
+        self._tables = [{} for _ in range(self._bands)]
+        # Pages with less text than this are too generic to fingerprint (error pages, empty shells)
+        self._min_words = min_words
+        self._learn_patterns = learn_patterns
+        self._pattern_min_samples = pattern_min_samples
+        self._pattern_duplicate_ratio = pattern_duplicate_ratio
+        self._pattern_seen = Counter()
+        self._pattern_duplicates = Counter()
+        self._skipped_patterns = set()
+        self.checked = 0
+        self.duplicates = 0
+        self.skipped = 0
+
+    def _band_keys(self, fingerprint):
+        return [(fingerprint >> (band * self._band_bits)) & self._band_mask for band in range(self._bands)]
+
+    def find(self, fingerprint):
+        for table, key in zip(self._tables, self._band_keys(fingerprint)):
+            for other, url in table.get(key, ()):
+                if bin(fingerprint ^ other).count("1") <= self._max_distance:
+                    return url
+        return None
+
+    def add(self, fingerprint, url):
+        entry = (fingerprint, url)
+        for table, key in zip(self._tables, self._band_keys(fingerprint)):
+            table.setdefault(key, []).append(entry)
+
+    def check(self, url, text):
+        # URL of an earlier near-duplicate, or None (and the page is indexed) when it's new
+        if len(_WORD_RE.findall(text)) < self._min_words:
+            return None
+        self.checked += 1
+        fingerprint = simhash(text)
+        original = self.find(fingerprint)
+        if original is None:
+            self.add(fingerprint, url)
+        else:
+            self.duplicates += 1
+        if self._learn_patterns:
+            self._learn(url_pattern(url), original is not None)
+        return original
+
+    def _learn(self, pattern, duplicate):
+        self._pattern_seen[pattern] += 1
+        if duplicate:
+            self._pattern_duplicates[pattern] += 1
+        seen = self._pattern_seen[pattern]
+        if seen >= self._pattern_min_samples and self._pattern_duplicates[pattern] / seen >= self._pattern_duplicate_ratio:
+            self._skipped_patterns.add(pattern)
+
+    def should_skip(self, url):
+        if self._skipped_patterns and url_pattern(url) in self._skipped_patterns:
+            self.skipped += 1
+            return True
+        return False
+
+    def stats(self):
+        return {
+            "checked": self.checked,
+            "duplicates": self.duplicates,
+            "skipped": self.skipped,
+            "skipped_patterns": sorted(self._skipped_patterns),
+        }
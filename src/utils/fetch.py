@@ -0,0 +1,110 @@
+import asyncio
+import html as html_lib
+import re
+from typing import Callable, List, Optional
+
+_TITLE_RE = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+_SCRIPT_STYLE_RE = re.compile(r"<(script|style|noscript)[^>]*>.*?</\1>", re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r"<[^>]+>")
+_JS_REQUIRED_RE = re.compile(
+    r"(please\s+)?enable\s+javascript|javascript\s+is\s+(required|disabled)|you\s+need\s+to\s+enable\s+javascript",
+    re.IGNORECASE,
+)
+_CHALLENGE_RE = re.compile(
+    r"cf-chl|challenge-platform|cf_chl_opt|just a moment\.\.\.|captcha|px-captcha|ddos-guard",
+    re.IGNORECASE,
+)
+
+
+class EscalateToBrowser(Exception):
+    # sticky: the page itself needs a browser, so the whole host moves to the browser tier; otherwise just this task
+    def __init__(self, reason, sticky=True):
+        super().__init__(reason)
+        self.sticky = sticky
+
+
+def visible_text(html: str) -> str:
+    text = _TAG_RE.sub(" ", _SCRIPT_STYLE_RE.sub(" ", html))
+    return " ".join(html_lib.unescape(text).split())
+
+
+def js_required_rule(status, html):
+    if _JS_REQUIRED_RE.search(html) and len(visible_text(html)) < 2000:
+        return "js_required"
+    return None
+
+
+def bot_challenge_rule(status, html):
+    if status in (403, 429, 503) and _CHALLENGE_RE.search(html):
+        return "bot_challenge"
+    return None
+
+
+def empty_content_rule(status, html, min_text=200):
+    if status < 300 and len(visible_text(html)) < min_text:
+        return "empty_content"
+    return None
+
+
+DEFAULT_RULES: List[Callable[[int, str], Optional[str]]] = [
+    bot_challenge_rule,
+    js_required_rule,
+    empty_content_rule,
+]
+
+
+class HttpPage:
+    # The subset of the Playwright page API a plain GET can answer; anything else needs the browser
+    def __init__(self, client, proxy=None, rules=None, headers=None, cache=None):
+        self._client = client
+        # utils.cache.ResourceCache; only used when it caches documents
+        self._cache = cache if cache is not None and cache.wants("document") else None
+        self._proxy = proxy
+        self._rules = DEFAULT_RULES if rules is None else rules
+        self._headers = headers
+        self._html = ""
+        self.status = None
+        self.headers = {}
+        self.url = "about:blank"
+
+    async def goto(self, url, **kwargs):
+        cached = await self._cache.get_async(url) if self._cache else None
+        if cached is not None:
+            status, headers, body = cached
+            html = body.decode("utf-8", "replace")
+        else:
+            html, status, headers = await self._client.get(url, headers=self._headers, proxy=self._proxy,
+                                                           with_headers=True)
+            if self._cache:
+                await self._cache.put_async(url, status, {}, html.encode("utf-8"), "document")
+        self.url = url
+        self.status = status
+        self.headers = {name.lower(): value for name, value in headers.items()}
+        self._html = html
+        for rule in self._rules:
+            reason = rule(status, html)
+            if reason:
+                raise EscalateToBrowser(reason)
+        return self
+
+    async def content(self):
+        return self._html
+
+    async def title(self):
+        match = _TITLE_RE.search(self._html)
+        return html_lib.unescape(match.group(1).strip()) if match else ""
+
+    async def inner_text(self, selector="body"):
+        return visible_text(self._html)
+
+    async def wait_for_timeout(self, timeout):
+        await asyncio.sleep(timeout / 1000)
+
+    async def evaluate(self, *args, **kwargs):
+        raise EscalateToBrowser("evaluate")
+
+    async def close(self):
+        pass
+
+    def __getattr__(self, name):
+        raise EscalateToBrowser(name)
@@ -0,0 +1,71 @@
+import contextvars
+from typing import Any, Callable, List, Optional
+from models import Task
+
+
+class _TaskScope:
+    def __init__(self, task: Task):
+        self.task = task
+        self.children: List[Task] = []
+        self.has_partial = False
+        self.partial = None
+        self.soft_expired = False
+
+    def reset(self):
+        # Forget what an abandoned attempt emitted before the task is run again, e.g. escalated to the browser
+        self.children = []
+        self.has_partial = False
+        self.partial = None
+
+
+_current_scope = contextvars.ContextVar("frontier_scope", default=None)
+
+
+def open_scope(task: Task):
+    scope = _TaskScope(task)
+    token = _current_scope.set(scope)
+    return scope, token
+
+
+def close_scope(token):
+    _current_scope.reset(token)
+
+
+def reset_scope():
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.reset()
+
+
+def current_task() -> Optional[Task]:
+    scope = _current_scope.get()
+    return scope.task if scope else None
+
+
+def partial(result):
+    # Latest partial result; returned as the task's result if the task hits its soft deadline
+    scope = _current_scope.get()
+    if scope is None:
+        raise RuntimeError("partial() can only be called from inside a running task handler")
+    scope.partial = result
+    scope.has_partial = True
+
+
+def emit(handle: Callable[..., Any], args, url: Optional[str] = None, **fields) -> Task:
+    # Children are buffered and only enqueued once the parent task succeeds,
+    # so a retried parent does not emit its links twice
+    scope = _current_scope.get()
+    if scope is None:
+        raise RuntimeError("emit() can only be called from inside a running task handler")
+    # Children stay in their parent's fair-share group unless told otherwise
+    fields.setdefault("group", scope.task.group)
+    task = Task(
+        handle=handle,
+        args=list(args),
+        url=url,
+        depth=scope.task.depth + 1,
+        parent_id=scope.task.id,
+        **fields
+    )
+    scope.children.append(task)
+    return task
@@ -1,18 +1,18 @@
-from openpyxl import Workbook,load_workbook
+import asyncio
 import json
 import re
-import aiohttp
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment
 from pathlib import Path
+# openpyxl and aiohttp are imported where they're used; together they're most of this module's import time
 
-def read_file_lines(file_path):
+def iter_file_lines(file_path):
     path = Path(file_path)
-    data = []
     with path.open('r') as file:
         for line in file:
-            data.append(line.strip())
-    return data
+            yield line.strip()
+
+
+def read_file_lines(file_path):
+    return list(iter_file_lines(file_path))
 
 
 
@@ -23,6 +23,23 @@ def get_sheet_id_from_url(url):
     return None
 
 
+def get_sheet_gviz_url(sheet_id):
+    return f"https://docs.google.com/spreadsheets/d/{sheet_id}/gviz/tq?tqx=out:json"
+
+
+def iter_sheet_urls(data):
+    match = re.search(r"google.visualization.Query.setResponse\((.*)\);", data)
+    if not match:
+        return
+    json_data = json.loads(match.group(1))
+    for row in json_data["table"]["rows"]:
+        first_cell = row["c"][0]
+        first_column_value = first_cell.get("v", "") if first_cell is not None else ""
+        # Only add the value if it's a URL (starts with http:// or https://)
+        if isinstance(first_column_value, str) and (first_column_value.startswith("http://") or first_column_value.startswith("https://")):
+            yield first_column_value
+
+
 
 async def get_url_links(sheet_url):
 
@@ -30,27 +47,16 @@ async def get_url_links(sheet_url):
     if not sheet_id:
         return []
     
-    url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/gviz/tq?tqx=out:json"
+    url = get_sheet_gviz_url(sheet_id)
     
+    import aiohttp
+
     try:
         async with aiohttp.ClientSession() as session:
             async with session.get(url) as response:
                 data = await response.text()
         
-        match = re.search(r"google.visualization.Query.setResponse\((.*)\);", data)
-        if match:
-            json_data = json.loads(match.group(1))
-            rows = json_data["table"]["rows"]
-            
-            first_column_values = []
-            for row in rows:
-                first_cell = row["c"][0]
-                first_column_value = first_cell.get("v", "") if first_cell is not None else ""
-                # Only add the value if it's a URL (starts with http:// or https://)
-                if isinstance(first_column_value, str) and (first_column_value.startswith("http://") or first_column_value.startswith("https://")):
-                    first_column_values.append(first_column_value)
-            
-            return first_column_values
+        return list(iter_sheet_urls(data))
     except Exception as e:
         print(f"Error fetching sheet data: {e}")
     
@@ -59,21 +65,91 @@ async def get_url_links(sheet_url):
 
 
 
-def export_to_excel(filename, sheet_name, headers, data):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = sheet_name
-
-    ws.append(headers)
-
-    bold_font = Font(bold=True)
-    center_alignment = Alignment(horizontal="center")
-
-    for cell in ws[1]: 
-        cell.font = bold_font
-        cell.alignment = center_alignment
-
+EXCEL_MAX_ROWS = 1_048_576
+
+
+class ExcelStreamWriter:
+    # Write-only workbook: rows are flushed to disk as they are appended instead of kept in memory.
+    # At Excel's row limit it rolls over to a new sheet ("sheet") or a new file ("file").
+    def __init__(self, filename, sheet_name, headers, max_rows=EXCEL_MAX_ROWS, rollover="sheet"):
+        self._path = Path(filename)
+        self._sheet_name = sheet_name
+        self._headers = headers
+        self._max_rows = max_rows
+        self._rollover = rollover
+        self._part = 0
+        self._wb = None
+        self._ws = None
+        self._rows = 0
+        self.files = []
+
+    def _header_row(self):
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, Alignment
+
+        bold_font = Font(bold=True)
+        center_alignment = Alignment(horizontal="center")
+        row = []
+        for header in self._headers:
+            cell = WriteOnlyCell(self._ws, value=header)
+            cell.font = bold_font
+            cell.alignment = center_alignment
+            row.append(cell)
+        return row
+
+    def _current_file(self):
+        if self._rollover == "file" and self._part > 0:
+            return self._path.with_name(f"{self._path.stem}_{self._part + 1}{self._path.suffix}")
+        return self._path
+
+    def _new_sheet(self):
+        if self._wb is None:
+            from openpyxl import Workbook
+            self._wb = Workbook(write_only=True)
+        title = self._sheet_name if self._rollover == "file" or self._part == 0 else f"{self._sheet_name}_{self._part + 1}"
+        self._ws = self._wb.create_sheet(title=title)
+        self._ws.append(self._header_row())
+        self._rows = 1
+
+    def append(self, row):
+        if self._ws is None:
+            self._new_sheet()
+        elif self._rows >= self._max_rows:
+            if self._rollover == "file":
+                self._save()
+            self._part += 1
+            self._new_sheet()
+        self._ws.append(row)
+        self._rows += 1
+
+    def _save(self):
+        path = self._current_file()
+        self._wb.save(path)
+        self.files.append(path)
+        self._wb = None
+        self._ws = None
+
+    def close(self):
+        if self._ws is None:
+            self._new_sheet()
+        self._save()
+        return self.files
+
+
+def export_to_excel(filename, sheet_name, headers, data, max_rows=EXCEL_MAX_ROWS, rollover="sheet"):
+    writer = ExcelStreamWriter(filename, sheet_name, headers, max_rows=max_rows, rollover=rollover)
     for row in data:
-        ws.append(row)
-    wb.save(filename)
-
+        writer.append(row)
+    return writer.close()
+
+
+async def export_to_excel_async(filename, sheet_name, headers, rows, max_rows=EXCEL_MAX_ROWS, rollover="sheet"):
+    # rows may be a plain or an async iterable, e.g. results read back from a worker or a sink
+    writer = ExcelStreamWriter(filename, sheet_name, headers, max_rows=max_rows, rollover=rollover)
+    if hasattr(rows, "__aiter__"):
+        async for row in rows:
+            writer.append(row)
+    else:
+        for row in rows:
+            writer.append(row)
+    return await asyncio.to_thread(writer.close)
@@ -0,0 +1,140 @@
+import re
+from collections import Counter
+from utils.urls import get_host
+
+DEFAULT_BLOCKED_RESOURCES = ("image", "media", "font")
+TRACKER_PATTERNS = (
+    r"google-analytics\.com", r"googletagmanager\.com", r"googlesyndication\.com", r"doubleclick\.net",
+    r"adservice\.google\.", r"facebook\.net", r"connect\.facebook\.com", r"hotjar\.com", r"segment\.(io|com)",
+    r"scorecardresearch\.com", r"amazon-adsystem\.com", r"criteo\.(com|net)", r"taboola\.com", r"outbrain\.com",
+    r"clarity\.ms", r"newrelic\.com", r"nr-data\.net",
+)
+# Rough typical transfer size per request of each type, for types that are always blocked and so never measured
+SIZE_PRIORS = {
+    "image": 30_000, "media": 500_000, "font": 30_000, "script": 20_000, "stylesheet": 10_000,
+    "xhr": 3_000, "fetch": 3_000, "other": 5_000,
+}
+
+
+def _compile(patterns):
+    return re.compile("|".join(f"(?:{pattern})" for pattern in patterns), re.IGNORECASE) if patterns else None
+
+
+class InterceptPolicy:
+    # What a page may load: blocked resource types, blocked URL patterns and an optional domain allowlist.
+    # allow_patterns win over everything; the page's own host always passes the allowlist
+    def __init__(self, block_resources=DEFAULT_BLOCKED_RESOURCES, block_patterns=TRACKER_PATTERNS,
+                 allow_domains=None, allow_patterns=()):
+        self.options = {
+            "block_resources": tuple(block_resources),
+            "block_patterns": tuple(block_patterns),
+            "allow_domains": tuple(allow_domains) if allow_domains is not None else None,
+            "allow_patterns": tuple(allow_patterns),
+        }
+        self._block_resources = frozenset(block_resources)
+        self._block_re = _compile(block_patterns)
+        self._allow_re = _compile(allow_patterns)
+        self._allow_domains = (
+            tuple(domain.lower().lstrip(".") for domain in allow_domains) if allow_domains is not None else None
+        )
+
+    def merged(self, overrides):
+        # Per-task overrides (Task.intercept) are plain dicts so tasks stay serializable
+        return InterceptPolicy(**{**self.options, **overrides})
+
+    def _domain_allowed(self, host, page_host):
+        if self._allow_domains is None or host == page_host:
+            return True
+        return any(host == domain or host.endswith("." + domain) for domain in self._allow_domains)
+
+    def check(self, url, resource_type, page_host=None):
+        # Reason the request is blocked, or None to let it through
+        if self._allow_re and self._allow_re.search(url):
+            return None
+        if resource_type in self._block_resources:
+            return "resource"
+        if self._block_re and self._block_re.search(url):
+            return "pattern"
+        if not self._domain_allowed(get_host(url), page_host):
+            return "domain"
+        return None
+
+
+class InterceptStats:
+    # Bytes saved are estimated from the average Content-Length of the same resource type on pages that loaded it,
+    # or from size_priors when none of that type ever loaded (the default policy blocks every image and font)
+    def __init__(self, metrics=None, size_priors=SIZE_PRIORS):
+        self._metrics = metrics
+        self._size_priors = size_priors
+        self.requests = Counter()
+        self.blocked = Counter()
+        self._bytes = Counter()
+        self._sized = Counter()
+
+    def record_request(self, resource_type, reason):
+        self.requests[resource_type] += 1
+        if reason:
+            self.blocked[(resource_type, reason)] += 1
+            if self._metrics is not None:
+                self._metrics.inc("requests_blocked_total", resource_type=resource_type, reason=reason)
+        elif self._metrics is not None:
+            self._metrics.inc("requests_allowed_total", resource_type=resource_type)
+
+    def record_response(self, resource_type, size):
+        self._bytes[resource_type] += size
+        self._sized[resource_type] += 1
+
+    def report(self):
+        by_type = {}
+        for resource_type, total in self.requests.items():
+            blocked = sum(count for (kind, _), count in self.blocked.items() if kind == resource_type)
+            measured = self._sized[resource_type] > 0
+            if measured:
+                average = self._bytes[resource_type] / self._sized[resource_type]
+            else:
+                average = self._size_priors.get(resource_type, self._size_priors.get("other", 0))
+            by_type[resource_type] = {
+                "requests": total,
+                "blocked": blocked,
+                "avg_bytes": round(average),
+                "avg_bytes_source": "measured" if measured else "prior",
+                "bytes_saved_estimate": round(blocked * average),
+            }
+        reasons = Counter()
+        for (_, reason), count in self.blocked.items():
+            reasons[reason] += count
+        return {
+            "requests": sum(self.requests.values()),
+            "blocked": sum(self.blocked.values()),
+            "blocked_by_reason": dict(reasons),
+            "bytes_loaded": sum(self._bytes.values()),
+            "bytes_saved_estimate": sum(entry["bytes_saved_estimate"] for entry in by_type.values()),
+            "by_type": by_type,
+        }
+
+
+def _is_main_document(request):
+    try:
+        return request.is_navigation_request() and request.frame.parent_frame is None
+    except Exception:
+        return False
+
+
+async def install_policy(page, policy: InterceptPolicy, stats: InterceptStats, page_host=None):
+    async def handle_route(route):
+        request = route.request
+        reason = None if _is_main_document(request) else policy.check(request.url, request.resource_type, page_host)
+        stats.record_request(request.resource_type, reason)
+        if reason:
+            await route.abort("blockedbyclient")
+        else:
+            # Later route handlers (e.g. the subresource cache) still get a say
+            await route.fallback()
+
+    def on_response(response):
+        length = response.headers.get("content-length")
+        if length and length.isdigit():
+            stats.record_response(response.request.resource_type, int(length))
+
+    await page.route("**/*", handle_route)
+    page.on("response", on_response)
@@ -0,0 +1,164 @@
+import math
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+# Labels whose values are unbounded in a large crawl; past the limit new values share the "other" series
+DEFAULT_LABEL_LIMITS = {"host": 100, "proxy": 200}
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+
+class Metrics:
+    def __init__(self, prefix="crawler_", buckets=DEFAULT_BUCKETS, label_limits=DEFAULT_LABEL_LIMITS):
+        self._prefix = prefix
+        self._buckets = buckets
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        # The first label_limits[name] values of a label keep their own series, so memory stays flat
+        self._label_limits = label_limits or {}
+        self._label_values = {name: set() for name in self._label_limits}
+
+    def _key(self, labels):
+        for name, limit in self._label_limits.items():
+            value = labels.get(name)
+            if value is None:
+                continue
+            seen = self._label_values[name]
+            if value not in seen:
+                if len(seen) >= limit:
+                    labels[name] = "other"
+                    continue
+                seen.add(value)
+        return _label_key(labels)
+
+    def inc(self, name, value=1, **labels):
+        series = self._counters.setdefault(name, {})
+        key = self._key(labels)
+        series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        self._gauges.setdefault(name, {})[self._key(labels)] = value
+
+    def observe(self, name, value, **labels):
+        series = self._histograms.setdefault(name, {})
+        key = self._key(labels)
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram(self._buckets)
+        histogram.observe(value)
+
+    @contextmanager
+    def span(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(f"{name}_seconds", time.perf_counter() - started, **labels)
+
+    def snapshot(self):
+        return {
+            "counters": {
+                name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                for name, series in self._counters.items()
+            },
+            "gauges": {
+                name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                for name, series in self._gauges.items()
+            },
+            "histograms": {
+                name: [
+                    {
+                        "labels": dict(key),
+                        "count": histogram.count,
+                        "sum": histogram.sum,
+                        "p50": histogram.quantile(0.5),
+                        "p99": histogram.quantile(0.99),
+                    }
+                    for key, histogram in series.items()
+                ]
+                for name, series in self._histograms.items()
+            },
+        }
+
+    def to_prometheus(self):
+        lines = []
+        for name, series in sorted(self._counters.items()):
+            metric = self._prefix + name
+            lines.append(f"# TYPE {metric} counter")
+            lines.extend(f"{metric}{_format_labels(key)} {value}" for key, value in series.items())
+        for name, series in sorted(self._gauges.items()):
+            metric = self._prefix + name
+            lines.append(f"# TYPE {metric} gauge")
+            lines.extend(f"{metric}{_format_labels(key)} {value}" for key, value in series.items())
+        for name, series in sorted(self._histograms.items()):
+            metric = self._prefix + name
+            lines.append(f"# TYPE {metric} histogram")
+            for key, histogram in series.items():
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == math.inf else repr(bound)
+                    lines.append(f"{metric}_bucket{_format_labels(key, [('le', le)])} {cumulative}")
+                lines.append(f"{metric}_sum{_format_labels(key)} {histogram.sum}")
+                lines.append(f"{metric}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        path = Path(path)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        tmp_path.write_text(self.to_prometheus())
+        tmp_path.replace(path)
+
+    async def serve(self, host="127.0.0.1", port=9108):
+        # Prometheus scrape endpoint at /metrics; returns the runner so the caller can cleanup()
+        from aiohttp import web
+
+        async def handle_metrics(request):
+            return web.Response(text=self.to_prometheus(), content_type="text/plain")
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle_metrics)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
@@ -1,38 +1,107 @@
-import aiohttp
+import asyncio
+import random
+from contextlib import asynccontextmanager
+# aiohttp is imported on first use so importing the worker doesn't pay for it when nothing goes over plain HTTP
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
 
 class AsyncHttpClient:
-    def __init__(self, base_url=None, timeout=30):
+    def __init__(self, base_url=None, timeout=30, limit=100, limit_per_host=10, ttl_dns_cache=300,
+                 keepalive_timeout=30, retries=0, backoff=0.5, max_backoff=10.0, retry_statuses=RETRY_STATUSES):
         self.base_url = base_url.rstrip("/") if base_url else None
-        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._timeout_seconds = timeout
         self.session = None
+        self._connector_options = {
+            "limit": limit,
+            "limit_per_host": limit_per_host,
+            "ttl_dns_cache": ttl_dns_cache,
+            "keepalive_timeout": keepalive_timeout,
+        }
+        self._retries = retries
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._retry_statuses = retry_statuses
+
+    def _get_session(self):
+        if self.session is None or self.session.closed:
+            import aiohttp
+            self.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self._timeout_seconds),
+                connector=aiohttp.TCPConnector(**self._connector_options),
+            )
+        return self.session
+
+    def _full_url(self, url):
+        return f"{self.base_url}{url}" if self.base_url else url
 
-    async def _request(self, method, url, **kwargs):
-        if self.session is None:
-            self.session = aiohttp.ClientSession(timeout=self.timeout)
+    @staticmethod
+    def _proxy_options(proxy):
+        # Accepts a proxy URL or a models.Proxy; aiohttp only tunnels through HTTP proxies
+        if proxy is None:
+            return {}
+        if isinstance(proxy, str):
+            return {"proxy": proxy}
+        config = proxy.parse()
+        options = {"proxy": config["server"]}
+        if "username" in config:
+            import aiohttp
+            options["proxy_auth"] = aiohttp.BasicAuth(config["username"], config["password"])
+        return options
 
-        try:
-            full_url = f"{self.base_url}{url}" if self.base_url else url
-            async with self.session.request(method, full_url, **kwargs) as response:
-                data = await response.text()
-                status = response.status
-                return data, status
-        finally:
-            pass 
-            # await self.close()
+    def _retry_delay(self, attempt):
+        delay = min(self._backoff * 2 ** attempt, self._max_backoff)
+        return random.uniform(0, delay)
 
-    async def get(self, url, params=None, headers=None):
-        return await self._request("GET", url, params=params, headers=headers)
+    async def _request(self, method, url, proxy=None, with_headers=False, **kwargs):
+        import aiohttp
+        kwargs.update(self._proxy_options(proxy))
+        full_url = self._full_url(url)
+        attempt = 0
+        while True:
+            try:
+                async with self._get_session().request(method, full_url, **kwargs) as response:
+                    status = response.status
+                    if status in self._retry_statuses and attempt < self._retries:
+                        await response.release()
+                    else:
+                        data = await response.text()
+                        if with_headers:
+                            return data, status, response.headers
+                        return data, status
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt >= self._retries:
+                    raise
+            await asyncio.sleep(self._retry_delay(attempt))
+            attempt += 1
 
-    async def post(self, url, data=None, json=None, headers=None):
-        return await self._request("POST", url, data=data, json=json, headers=headers)
+    @asynccontextmanager
+    async def stream(self, method, url, proxy=None, **kwargs):
+        # Yields the open response so large bodies can be read with response.content.iter_chunked()
+        kwargs.update(self._proxy_options(proxy))
+        async with self._get_session().request(method, self._full_url(url), **kwargs) as response:
+            yield response
 
-    async def put(self, url, data=None, json=None, headers=None):
-        return await self._request("PUT", url, data=data, json=json, headers=headers)
+    async def iter_chunks(self, url, chunk_size=65536, proxy=None, **kwargs):
+        async with self.stream("GET", url, proxy=proxy, **kwargs) as response:
+            async for chunk in response.content.iter_chunked(chunk_size):
+                yield chunk
 
-    async def delete(self, url, headers=None):
-        return await self._request("DELETE", url, headers=headers)
+    async def get(self, url, params=None, headers=None, proxy=None, with_headers=False, **kwargs):
+        return await self._request("GET", url, params=params, headers=headers, proxy=proxy,
+                                   with_headers=with_headers, **kwargs)
+
+    async def post(self, url, data=None, json=None, headers=None, proxy=None):
+        return await self._request("POST", url, data=data, json=json, headers=headers, proxy=proxy)
+
+    async def put(self, url, data=None, json=None, headers=None, proxy=None):
+        return await self._request("PUT", url, data=data, json=json, headers=headers, proxy=proxy)
+
+    async def delete(self, url, headers=None, proxy=None):
+        return await self._request("DELETE", url, headers=headers, proxy=proxy)
 
     async def close(self):
         if self.session:
             await self.session.close()
-            self.session = None
\ No newline at end of file
+            self.session = None
+
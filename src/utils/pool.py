@@ -0,0 +1,82 @@
+import asyncio
+
+
+class BrowserSlot:
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        # Held while the slot launches or recycles, so prewarm() and the slot's worker don't both launch
+        self.lock = asyncio.Lock()
+        self.browser = None
+        self.proxy = None
+        self.tasks = 0
+        self._manager = None
+
+    @property
+    def is_open(self):
+        return self.browser is not None
+
+    def is_connected(self):
+        try:
+            return self.browser.is_connected()
+        except Exception:
+            return False
+
+    async def open(self, manager, proxy):
+        self.browser = await manager.__aenter__()
+        self._manager = manager
+        self.proxy = proxy
+        self.tasks = 0
+
+    async def close(self):
+        manager = self._manager
+        self._manager = None
+        self.browser = None
+        self.proxy = None
+        if manager is None:
+            return
+        try:
+            await manager.__aexit__(None, None, None)
+        except Exception:
+            pass
+
+
+class BrowserPool:
+    def __init__(self, recycle_after=50):
+        self._recycle_after = recycle_after
+        self._slots = {}
+        self.launches = 0
+        self.recycles = 0
+
+    def slot(self, worker_id) -> BrowserSlot:
+        if worker_id not in self._slots:
+            self._slots[worker_id] = BrowserSlot(worker_id)
+        return self._slots[worker_id]
+
+    def should_recycle(self, slot: BrowserSlot, proxy_manager=None):
+        if not slot.is_connected():
+            return True
+        if self._recycle_after and slot.tasks >= self._recycle_after:
+            return True
+        if proxy_manager and slot.proxy and proxy_manager.is_blacklisted(slot.proxy):
+            return True
+        return False
+
+    async def open(self, slot: BrowserSlot, manager, proxy):
+        await slot.open(manager, proxy)
+        self.launches += 1
+
+    async def recycle(self, slot: BrowserSlot):
+        await slot.close()
+        self.recycles += 1
+
+    async def close(self):
+        for slot in self._slots.values():
+            await slot.close()
+        self._slots = {}
+
+    def stats(self):
+        return {
+            "browsers": sum(1 for slot in self._slots.values() if slot.is_open),
+            "launches": self.launches,
+            "recycles": self.recycles,
+        }
@@ -1,22 +1,104 @@
 from utils.helper import read_file_lines
 from utils.network import AsyncHttpClient
+from utils.retry import NoProxyAvailable
 from models import Proxy
+import asyncio
+import base64
 import random
-from typing import List, Set  
+import heapq
+import time
+from pathlib import Path
+from typing import List, Set, Optional
+from urllib.parse import urlsplit
 import json
+import os
 
 
 
+class ProxyChecker:
+    def __init__(self, test_url="http://httpbin.org/ip", timeout=5.0, concurrency=100):
+        self._test_url = test_url
+        self._timeout = timeout
+        self._concurrency = concurrency
+
+    async def _probe_http(self, proxy: Proxy, reader, writer):
+        host = urlsplit(self._test_url).netloc
+        headers = f"Host: {host}\r\nConnection: close\r\n"
+        if proxy.username and proxy.password:
+            credentials = base64.b64encode(f"{proxy.username}:{proxy.password}".encode()).decode()
+            headers += f"Proxy-Authorization: Basic {credentials}\r\n"
+        writer.write(f"GET {self._test_url} HTTP/1.1\r\n{headers}\r\n".encode())
+        await writer.drain()
+        status_line = await reader.readline()
+        parts = status_line.split()
+        return len(parts) >= 2 and parts[0].startswith(b"HTTP/") and parts[1][:1] in (b"2", b"3")
+
+    async def _probe_socks5(self, reader, writer):
+        writer.write(b"\x05\x01\x00")
+        await writer.drain()
+        return await reader.readexactly(2) == b"\x05\x00"
+
+    async def _probe(self, proxy: Proxy):
+        protocol = next(iter(proxy.protocol))
+        reader, writer = await asyncio.open_connection(proxy.ip, proxy.port)
+        try:
+            if protocol in ("http", "https"):
+                return await self._probe_http(proxy, reader, writer)
+            if protocol == "socks5":
+                return await self._probe_socks5(reader, writer)
+            # socks4 has no anonymous handshake worth probing; a completed connect is the signal
+            return True
+        finally:
+            writer.close()
+
+    async def check(self, proxy: Proxy) -> Optional[float]:
+        # Returns the measured round trip in milliseconds, or None if the proxy is unusable
+        started = time.monotonic()
+        try:
+            ok = await asyncio.wait_for(self._probe(proxy), self._timeout)
+        except Exception:
+            # Whatever a broken proxy sends back (an overlong line, garbage, a reset) only makes that one proxy dead
+            ok = False
+        if not ok:
+            return None
+        return (time.monotonic() - started) * 1000
+
+    async def filter(self, proxies: List[Proxy]) -> List[Proxy]:
+        semaphore = asyncio.Semaphore(self._concurrency)
+
+        async def check_one(proxy):
+            async with semaphore:
+                return proxy, await self.check(proxy)
+
+        checked = await asyncio.gather(*(check_one(proxy) for proxy in proxies))
+        alive = [
+            proxy.model_copy(update={"responseTime": latency})
+            for proxy, latency in checked
+            if latency is not None
+        ]
+        alive.sort(key=lambda proxy: proxy.responseTime)
+        return alive
+
+
 class FreeProxy:
     _suppliers = {
         "proxy_scrape":"https://api.proxyscrape.com/v4/free-proxy-list/get?request=display_proxies&proxy_format=protocolipport&format=json&timeout=500",
         "proxy_geonode":"https://proxylist.geonode.com/api/proxy-list?limit=500&page=1&sort_by=lastChecked&sort_type=desc"
     }
-    def __init__(self):
-        self._client = AsyncHttpClient()
+    def __init__(self, checker:ProxyChecker=None, validate=True, cache_path=".proxy_cache.json", cache_ttl=900,
+                 client:AsyncHttpClient=None, suppliers=None):
+        if suppliers:
+            self._suppliers = {**self._suppliers, **suppliers}
+        # The client (and its connection pool) lives across refreshes; call close() when done with it.
+        # A client passed in is shared with its owner (e.g. the worker's) and left open
+        self._client = client or AsyncHttpClient(retries=2)
+        self._owns_client = client is None
+        self._checker = checker or ProxyChecker()
+        self._validate = validate
+        self._cache_path = Path(cache_path) if cache_path else None
+        self._cache_ttl = cache_ttl
 
     async def get_proxyscrape(self)->List[Proxy]:
-        url=self._suppliers["proxy_scrape"]
         data,status=await self._client.get(url=self._suppliers["proxy_scrape"])
         results=[]
         if status==200:
@@ -29,16 +111,16 @@ class FreeProxy:
                     port=item["port"],
                     protocol=[item["protocol"]],
                     responseTime=item["timeout"],
-                    countryCode=item["ip_data"]["countryCode"])
+                    countryCode=(item.get("ip_data") or {}).get("countryCode"))
                 results.append(proxy)
         return results
         
 
     async def get_geonode(self)->List[Proxy]:
         data,status=await self._client.get(url=self._suppliers["proxy_geonode"])
+        results=[]
         if status==200:
             json_data=json.loads(data)
-            results=[]
             for item in json_data["data"]:
                 if item["responseTime"]>500:
                     continue
@@ -50,20 +132,95 @@ class FreeProxy:
                     countryCode=item["country"])
                 results.append(proxy)
         return results
-    
-    async def get_proxies(self)->List[Proxy]:
+
+    async def fetch_suppliers(self)->List[Proxy]:
+        fetched = await asyncio.gather(self.get_proxyscrape(), self.get_geonode(), return_exceptions=True)
+        merged = {}
+        for supplier in fetched:
+            if isinstance(supplier, Exception):
+                continue
+            for proxy in supplier:
+                key = (proxy.ip, proxy.port)
+                if key not in merged or proxy.responseTime < merged[key].responseTime:
+                    merged[key] = proxy
+        return list(merged.values())
+
+    def _load_cache(self)->Optional[List[Proxy]]:
+        if not self._cache_path or not self._cache_path.exists():
+            return None
         try:
-            proxyscrape=await self.get_proxyscrape()
-            # geonode=await self.get_geonode()
-            return proxyscrape
-        finally:
+            cached = json.loads(self._cache_path.read_text())
+            if time.time() - cached["fetched_at"] > self._cache_ttl:
+                return None
+            return [Proxy(**item) for item in cached["proxies"]]
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def _save_cache(self, proxies: List[Proxy]):
+        if not self._cache_path:
+            return
+        payload = {"fetched_at": time.time(), "proxies": [proxy.model_dump() for proxy in proxies]}
+        # Per-process temp file, so processes refreshing at the same time don't rename each other's file away
+        tmp_path = self._cache_path.with_suffix(f"{self._cache_path.suffix}.{os.getpid()}.tmp")
+        try:
+            tmp_path.write_text(json.dumps(payload))
+            tmp_path.replace(self._cache_path)
+        except OSError:
+            # The cache only saves a refetch next time; a failed write must not fail the caller
+            tmp_path.unlink(missing_ok=True)
+    
+    async def get_proxies(self, refresh=False)->List[Proxy]:
+        if not refresh:
+            cached = self._load_cache()
+            if cached:
+                return cached
+        proxies = await self.fetch_suppliers()
+        if self._validate:
+            proxies = await self._checker.filter(proxies)
+        self._save_cache(proxies)
+        return proxies
+
+    async def close(self):
+        if self._owns_client:
             await self._client.close()
     
 
 
 
+class StaticProxies:
+    # A fixed, already validated pool in place of FreeProxy, e.g. fetched once by the parent of sharded workers
+    def __init__(self, proxies: List[Proxy]):
+        self._proxies = list(proxies)
+
+    async def get_proxies(self, refresh=False) -> List[Proxy]:
+        return list(self._proxies)
+
+    async def close(self):
+        pass
+
+
+class _ProxyStats:
+    __slots__ = ("proxy", "success_rate", "latency", "failures", "cooldown_until")
+
+    def __init__(self, proxy: Proxy):
+        self.proxy = proxy
+        self.success_rate = 1.0
+        # Supplier response times are in milliseconds; observed latencies are in seconds
+        self.latency = proxy.responseTime / 1000
+        self.failures = 0
+        self.cooldown_until = 0.0
+
+    def score(self):
+        return self.success_rate / (self.latency + 0.1)
+
+
+def _proxy_key(proxy: Proxy):
+    return (proxy.ip, proxy.port)
+
+
 class ProxyManager:
-    def __init__(self, free_proxy:FreeProxy=None):
+    def __init__(self, free_proxy:FreeProxy=None, smoothing=0.2, base_cooldown=30.0, max_cooldown=1800.0,
+                 refetch_delay=30.0, max_refetch_delay=900.0):
         if free_proxy:
             self.free_proxy = free_proxy
         else:
@@ -72,53 +229,201 @@ class ProxyManager:
         self.proxy_list: List[Proxy] = []
         self.whitelist = set()
         self.blacklist= set()
-    
+        self._smoothing = smoothing
+        self._base_cooldown = base_cooldown
+        self._max_cooldown = max_cooldown
+        self._stats = {}
+        # Available keys in a list plus their positions, so add/remove/pick are all O(1)
+        self._available = []
+        self._positions = {}
+        self._cooldowns = []
+        # Suppliers that came back empty are asked again after an exponentially growing delay, not on every task
+        self._refetch_delay = refetch_delay
+        self._max_refetch_delay = max_refetch_delay
+        self._empty_fetches = 0
+        self._next_fetch = 0.0
+        self._fetching = None
+
+    def _index(self, proxies: List[Proxy]):
+        self.proxy_list = proxies
+        stats = {}
+        for proxy in proxies:
+            key = _proxy_key(proxy)
+            stats[key] = self._stats.get(key) or _ProxyStats(proxy)
+        self._stats = stats
+        self._available = []
+        self._positions = {}
+        self._cooldowns = []
+        self.blacklist = set()
+        self.whitelist &= set(stats)
+        now = time.monotonic()
+        for key, stat in stats.items():
+            if stat.cooldown_until > now:
+                self.blacklist.add(key)
+                heapq.heappush(self._cooldowns, (stat.cooldown_until, key))
+            else:
+                self._make_available(key)
+
+    def _make_available(self, key):
+        if key in self._positions:
+            return
+        self._positions[key] = len(self._available)
+        self._available.append(key)
+
+    def _make_unavailable(self, key):
+        pos = self._positions.pop(key, None)
+        if pos is None:
+            return
+        last = self._available.pop()
+        if pos < len(self._available):
+            self._available[pos] = last
+            self._positions[last] = pos
+
+    def _release_cooldowns(self, now):
+        while self._cooldowns and self._cooldowns[0][0] <= now:
+            until, key = heapq.heappop(self._cooldowns)
+            stat = self._stats.get(key)
+            # Skip stale heap entries left behind by a newer, longer cooldown
+            if stat is None or stat.cooldown_until != until:
+                continue
+            self.blacklist.discard(key)
+            self._make_available(key)
+
     def _get_available_proxies(self):
-        if self.whitelist:
-            print("Using whitelist")
-            return list(self.whitelist)
-        available_proxies = []
-        for proxy in self.proxy_list:
-            if not any(proxy.ip == black_proxy.ip and proxy.port == black_proxy.port 
-                      for black_proxy in self.blacklist):
-                available_proxies.append(proxy)
-        return available_proxies
-
-
-    async def get_random_proxy(self):
-        if not self.proxy_list:
-            self.proxy_list=await self.free_proxy.get_proxies()
-        if len(self.blacklist) >= len(self.proxy_list):
-            print("All proxies are blacklisted. Clearing blacklist.")
-            self.blacklist.clear()
-            self.whitelist.clear()
-        
-        available_proxies = self._get_available_proxies()
-        print(f"Available proxies: {len(available_proxies)}")
+        self._release_cooldowns(time.monotonic())
+        return [self._stats[key].proxy for key in self._available]
+
+    async def _fetch_proxies(self):
+        proxies = await self.free_proxy.get_proxies(refresh=self._empty_fetches > 0)
+        if proxies:
+            self._empty_fetches = 0
+        else:
+            self._empty_fetches += 1
+            delay = min(self._refetch_delay * 2 ** (self._empty_fetches - 1), self._max_refetch_delay)
+            self._next_fetch = time.monotonic() + delay
+        self._index(proxies)
+
+    async def get_random_proxy(self, protocols=None):
+        if not self.proxy_list and time.monotonic() >= self._next_fetch:
+            # Workers that find the pool empty at the same time share one fetch
+            if self._fetching is None:
+                self._fetching = asyncio.ensure_future(self._fetch_proxies())
+            fetching = self._fetching
+            try:
+                await asyncio.shield(fetching)
+            finally:
+                if fetching.done() and self._fetching is fetching:
+                    self._fetching = None
+        if not self._stats:
+            # Never fall back to a direct connection: that would crawl from this machine's own IP
+            raise NoProxyAvailable(
+                f"No proxies available; suppliers are asked again in {max(self._next_fetch - time.monotonic(), 0):.0f}s"
+            )
+
+        self._release_cooldowns(time.monotonic())
+        if not self._available:
+            # Everything is cooling down: end the cooldown that would expire first instead of resetting all
+            while self._cooldowns:
+                until, key = heapq.heappop(self._cooldowns)
+                stat = self._stats.get(key)
+                if stat is not None and stat.cooldown_until == until:
+                    stat.cooldown_until = 0.0
+                    self.blacklist.discard(key)
+                    self._make_available(key)
+                    break
+
+        if protocols is not None:
+            return self._pick_with_protocol(protocols)
+        # Power of two choices: sample two proxies and keep the better scored one
+        first = self._stats[random.choice(self._available)]
+        second = self._stats[random.choice(self._available)]
+        return (first if first.score() >= second.score() else second).proxy
 
-        try:    
-            return random.choice(available_proxies)
+    def _pick_with_protocol(self, protocols, draws=16):
+        # Proxies are used through their first protocol (Proxy.parse); random draws keep this O(1) on mixed pools,
+        # a full scan only runs when they all miss
+        def usable(key):
+            return next(iter(self._stats[key].proxy.protocol)) in protocols
 
-        except Exception as e:
-            print(f"Error creating proxy configuration: {e}")
-            self.add_to_blacklist(proxy)
+        candidates = [key for key in (random.choice(self._available) for _ in range(draws)) if usable(key)][:2]
+        if not candidates:
+            matching = [key for key in self._available if usable(key)]
+            candidates = random.sample(matching, min(2, len(matching)))
+        if not candidates:
+            raise NoProxyAvailable(f"No available proxy speaks {'/'.join(protocols)}")
+        return max((self._stats[key] for key in candidates), key=_ProxyStats.score).proxy
+
+    def record_success(self, proxy, latency=None):
+        if proxy is None:
+            return
+        stat = self._stats.get(_proxy_key(proxy))
+        if stat is None:
+            return
+        stat.success_rate += self._smoothing * (1.0 - stat.success_rate)
+        if latency is not None:
+            stat.latency += self._smoothing * (latency - stat.latency)
+        stat.failures = 0
+        self.whitelist.add(_proxy_key(proxy))
+
+    def record_failure(self, proxy):
+        if proxy is None:
+            return
+        key = _proxy_key(proxy)
+        stat = self._stats.get(key)
+        if stat is None:
+            return
+        stat.success_rate -= self._smoothing * stat.success_rate
+        stat.failures += 1
+        cooldown = min(self._base_cooldown * 2 ** (stat.failures - 1), self._max_cooldown)
+        stat.cooldown_until = time.monotonic() + cooldown
+        heapq.heappush(self._cooldowns, (stat.cooldown_until, key))
+        self._make_unavailable(key)
+        self.blacklist.add(key)
+        self.whitelist.discard(key)
     
     def add_to_blacklist(self, proxy):
-        self.blacklist.add(proxy)
-        self.whitelist.discard(proxy)
+        self.record_failure(proxy)
+
+    def add_to_whitelist(self, proxy, latency=None):
+        self.record_success(proxy, latency)
 
-    def add_to_whitelist(self, proxy):
-        self.whitelist.add(proxy)
+    def is_blacklisted(self, proxy):
+        return _proxy_key(proxy) in self.blacklist
 
+    def get_proxy_stats(self, proxy):
+        stat = self._stats.get(_proxy_key(proxy))
+        if stat is None:
+            return None
+        return {
+            "success_rate": stat.success_rate,
+            "latency": stat.latency,
+            "failures": stat.failures,
+            "cooling_down": _proxy_key(proxy) in self.blacklist,
+        }
+    
+    def export_health(self):
+        return {
+            f"{key[0]}:{key[1]}": {
+                "success_rate": stat.success_rate,
+                "latency": stat.latency,
+                "failures": stat.failures,
+                "cooling_down": key in self.blacklist,
+            }
+            for key, stat in self._stats.items()
+            if stat.failures or key in self.whitelist or key in self.blacklist
+        }
     
     def get_proxy_count(self):
         return len(self.proxy_list)
     
+    async def close(self):
+        await self.free_proxy.close()
+
     async def reload_proxies(self):
-        self.proxy_list = await self.free_proxy.get_proxies()
-        
+        self._empty_fetches = 0
+        self._next_fetch = 0.0
+        self._index(await self.free_proxy.get_proxies(refresh=True))
 
-proxy_manager = ProxyManager()
 
 
 
@@ -0,0 +1,139 @@
+import asyncio
+import heapq
+import itertools
+import random
+import re
+from enum import Enum
+
+
+class ErrorClass(str, Enum):
+    PROXY = "proxy"
+    BROWSER = "browser"
+    TIMEOUT = "timeout"
+    THROTTLED = "throttled"
+    HANDLER = "handler"
+    PERMANENT = "permanent"
+
+
+# Handlers can raise these to classify a failure explicitly
+class ProxyError(Exception):
+    pass
+
+
+# No usable proxy right now (empty pool, or none speaks the protocol needed); never a reason to go direct
+class NoProxyAvailable(ProxyError):
+    pass
+
+
+class ThrottledError(Exception):
+    pass
+
+
+class PermanentError(Exception):
+    pass
+
+
+# Raised by the worker when a task runs past its deadline; not blamed on the proxy
+class TaskTimeout(Exception):
+    pass
+
+
+_PROXY_RE = re.compile(
+    r"NS_ERROR_(PROXY|UNKNOWN_PROXY_HOST|NET_TIMEOUT|NET_RESET|NET_INTERRUPT|CONNECTION_REFUSED)"
+    r"|ERR_(PROXY|TUNNEL|TIMED_OUT|CONNECTION)|Timeout \d+ms exceeded",
+    re.IGNORECASE,
+)
+_BROWSER_RE = re.compile(r"has been closed|crashed|disconnected", re.IGNORECASE)
+_THROTTLED_RE = re.compile(r"\b(429|502|503|504)\b|too many requests|rate.?limit", re.IGNORECASE)
+_PERMANENT_RE = re.compile(r"\b(404|410)\b|NS_ERROR_UNKNOWN_HOST|ERR_NAME_NOT_RESOLVED", re.IGNORECASE)
+_URL_RE = re.compile(r"\b[a-z][a-z0-9+.-]*://\S+", re.IGNORECASE)
+
+
+def _error_text(error: BaseException):
+    # Playwright appends a call log that repeats the URL and navigation steps; only the error line itself counts,
+    # and URLs are dropped so a path like /deals/404-sale can't look like a status code
+    message = str(error).split("Call log:", 1)[0]
+    return _URL_RE.sub("", f"{type(error).__name__}: {message}")
+
+
+def classify_error(error: BaseException) -> ErrorClass:
+    if isinstance(error, PermanentError):
+        return ErrorClass.PERMANENT
+    if isinstance(error, ThrottledError):
+        return ErrorClass.THROTTLED
+    if isinstance(error, TaskTimeout):
+        return ErrorClass.TIMEOUT
+    if isinstance(error, (ProxyError, asyncio.TimeoutError, ConnectionError)):
+        return ErrorClass.PROXY
+    message = _error_text(error)
+    # Network markers first: a refused proxy connection is the proxy's fault whatever else the message says
+    if _PROXY_RE.search(message) or type(error).__name__ in ("TimeoutError", "ClientProxyConnectionError"):
+        return ErrorClass.PROXY
+    if _BROWSER_RE.search(message):
+        return ErrorClass.BROWSER
+    if _THROTTLED_RE.search(message):
+        return ErrorClass.THROTTLED
+    if _PERMANENT_RE.search(message):
+        return ErrorClass.PERMANENT
+    return ErrorClass.HANDLER
+
+
+class RetryPolicy:
+    def __init__(self, max_retries=3, base_delay=1.0, max_delay=60.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        # Exponential backoff with full jitter
+        return random.uniform(0, min(self.base_delay * 2 ** max(attempt - 1, 0), self.max_delay))
+
+
+def default_policies(max_retries):
+    return {
+        ErrorClass.PROXY: RetryPolicy(max_retries=max_retries, base_delay=0.5, max_delay=30.0),
+        ErrorClass.BROWSER: RetryPolicy(max_retries=max_retries, base_delay=0.1, max_delay=5.0),
+        ErrorClass.TIMEOUT: RetryPolicy(max_retries=min(2, max_retries), base_delay=1.0, max_delay=30.0),
+        ErrorClass.THROTTLED: RetryPolicy(max_retries=max_retries, base_delay=5.0, max_delay=300.0),
+        ErrorClass.HANDLER: RetryPolicy(max_retries=min(1, max_retries), base_delay=1.0, max_delay=10.0),
+        ErrorClass.PERMANENT: RetryPolicy(max_retries=0),
+    }
+
+
+class DelayQueue:
+    # Holds tasks waiting out their backoff and calls release(task) once each is due
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()
+        self._changed = asyncio.Event()
+        self._runner = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule(self, task, delay, release):
+        loop = asyncio.get_running_loop()
+        heapq.heappush(self._heap, (loop.time() + delay, next(self._counter), task, release))
+        self._changed.set()
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while self._heap:
+            due = self._heap[0][0]
+            now = loop.time()
+            if due > now:
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), due - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, task, release = heapq.heappop(self._heap)
+            await release(task)
+
+    def cancel(self):
+        if self._runner is not None:
+            self._runner.cancel()
+            self._runner = None
@@ -0,0 +1,258 @@
+import asyncio
+import heapq
+import itertools
+from collections import deque
+from models import Task
+from utils.urls import get_host
+
+
+class FifoTaskQueue(asyncio.Queue):
+    # Plain FIFO with the task-aware task_done() that BrowserWorker calls on every queue type
+    def task_done(self, task: Task = None):
+        super().task_done()
+
+
+class _HostState:
+    def __init__(self, max_concurrency, min_delay):
+        self.max_concurrency = max_concurrency
+        self.min_delay = min_delay
+        self.pending = deque()
+        self.active = 0
+        self.next_allowed = 0.0
+        self.in_rotation = False
+        self.dispatched = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+
+class HostScheduler:
+    def __init__(self, max_per_host=2, min_delay=1.0, host_overrides=None):
+        self._max_per_host = max_per_host
+        self._min_delay = min_delay
+        # {"example.com": {"max_concurrency": 1, "min_delay": 5.0}}
+        self._host_overrides = host_overrides or {}
+        self._hosts = {}
+        self._rotation = deque()
+        self._size = 0
+        self._unfinished = 0
+        self._released = set()
+        self._finished = asyncio.Event()
+        self._finished.set()
+        self._wakeup = asyncio.Event()
+
+    def _host_state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            override = self._host_overrides.get(host, {})
+            state = _HostState(
+                override.get("max_concurrency", self._max_per_host),
+                override.get("min_delay", self._min_delay),
+            )
+            self._hosts[host] = state
+        return state
+
+    @staticmethod
+    def _task_host(task: Task):
+        return get_host(task.url) if task.url else ""
+
+    def put_nowait(self, task: Task):
+        state = self._host_state(self._task_host(task))
+        state.pending.append((task, asyncio.get_running_loop().time()))
+        if not state.in_rotation:
+            state.in_rotation = True
+            self._rotation.append(self._task_host(task))
+        self._size += 1
+        self._unfinished += 1
+        self._finished.clear()
+        self._wakeup.set()
+
+    async def put(self, task: Task):
+        self.put_nowait(task)
+
+    def _pick(self, now):
+        earliest = None
+        for _ in range(len(self._rotation)):
+            host = self._rotation.popleft()
+            state = self._hosts[host]
+            if not state.pending:
+                state.in_rotation = False
+                continue
+            self._rotation.append(host)
+            if state.active >= state.max_concurrency:
+                continue
+            if state.next_allowed > now:
+                delay = state.next_allowed - now
+                earliest = delay if earliest is None else min(earliest, delay)
+                continue
+
+            task, enqueued_at = state.pending.popleft()
+            wait = now - enqueued_at
+            state.active += 1
+            state.next_allowed = now + state.min_delay
+            state.dispatched += 1
+            state.total_wait += wait
+            state.max_wait = max(state.max_wait, wait)
+            self._size -= 1
+            return task, None
+        return None, earliest
+
+    async def get(self) -> Task:
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wakeup.clear()
+            task, delay = self._pick(loop.time())
+            if task is not None:
+                return task
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _release_host(self, task: Task):
+        state = self._hosts.get(self._task_host(task))
+        if state and state.active > 0:
+            state.active -= 1
+
+    def release(self, task: Task):
+        # Frees the host slot of a task that's waiting out a retry backoff; its task_done() comes later
+        self._release_host(task)
+        self._released.add(task.id)
+        self._wakeup.set()
+
+    def task_done(self, task: Task = None):
+        if task is not None:
+            if task.id in self._released:
+                self._released.discard(task.id)
+            else:
+                self._release_host(task)
+        if self._unfinished <= 0:
+            raise ValueError("task_done() called too many times")
+        self._unfinished -= 1
+        if self._unfinished == 0:
+            self._finished.set()
+        self._wakeup.set()
+
+    async def join(self):
+        await self._finished.wait()
+
+    def qsize(self):
+        return self._size
+
+    def empty(self):
+        return self._size == 0
+
+    def host_stats(self):
+        return {
+            host: {
+                "queued": len(state.pending),
+                "active": state.active,
+                "dispatched": state.dispatched,
+                "avg_wait": state.total_wait / state.dispatched if state.dispatched else 0.0,
+                "max_wait": state.max_wait,
+            }
+            for host, state in self._hosts.items()
+        }
+
+
+def default_priority(task: Task):
+    # Caller-assigned score first, then shallow pages before deep ones
+    return task.priority - task.depth
+
+
+class _Group:
+    __slots__ = ("name", "weight", "heap", "pass_value", "active", "dispatched")
+
+    def __init__(self, name, weight):
+        self.name = name
+        self.weight = weight
+        self.heap = []
+        self.pass_value = 0.0
+        self.active = False
+        self.dispatched = 0
+
+
+class PriorityScheduler:
+    # Per-group heaps keyed by enqueue_time * aging_rate - priority, so a waiting task gains aging_rate priority
+    # per second and can't starve; groups take turns by stride scheduling (each pick advances the group's pass
+    # by 1 / weight, lowest pass goes next). put and get are O(log tasks + log groups)
+    def __init__(self, priority=default_priority, aging_rate=1 / 60, group_weights=None, default_weight=1.0):
+        self._priority = priority
+        self._aging_rate = aging_rate
+        # {"tenant-a": 3, "tenant-b": 1}: tenant-a gets three tasks for every one of tenant-b while both have work
+        self._group_weights = group_weights or {}
+        self._default_weight = default_weight
+        self._groups = {}
+        self._ready = []
+        self._virtual_time = 0.0
+        self._counter = itertools.count()
+        self._size = 0
+        self._unfinished = 0
+        self._finished = asyncio.Event()
+        self._finished.set()
+        self._wakeup = asyncio.Event()
+
+    def _group(self, name):
+        group = self._groups.get(name)
+        if group is None:
+            group = self._groups[name] = _Group(name, self._group_weights.get(name, self._default_weight))
+        return group
+
+    def put_nowait(self, task: Task):
+        group = self._group(task.group)
+        key = asyncio.get_running_loop().time() * self._aging_rate - self._priority(task)
+        heapq.heappush(group.heap, (key, next(self._counter), task))
+        if not group.active:
+            # A group returning from idle starts at the current virtual time instead of cashing in its idle time
+            group.active = True
+            group.pass_value = max(group.pass_value, self._virtual_time)
+            heapq.heappush(self._ready, (group.pass_value, next(self._counter), group))
+        self._size += 1
+        self._unfinished += 1
+        self._finished.clear()
+        self._wakeup.set()
+
+    async def put(self, task: Task):
+        self.put_nowait(task)
+
+    def get_nowait(self) -> Task:
+        if not self._ready:
+            raise asyncio.QueueEmpty
+        pass_value, _, group = heapq.heappop(self._ready)
+        self._virtual_time = pass_value
+        _, _, task = heapq.heappop(group.heap)
+        group.dispatched += 1
+        group.pass_value = pass_value + 1 / group.weight
+        if group.heap:
+            heapq.heappush(self._ready, (group.pass_value, next(self._counter), group))
+        else:
+            group.active = False
+        self._size -= 1
+        return task
+
+    async def get(self) -> Task:
+        while not self._ready:
+            self._wakeup.clear()
+            await self._wakeup.wait()
+        return self.get_nowait()
+
+    def task_done(self, task: Task = None):
+        if self._unfinished <= 0:
+            raise ValueError("task_done() called too many times")
+        self._unfinished -= 1
+        if self._unfinished == 0:
+            self._finished.set()
+
+    async def join(self):
+        await self._finished.wait()
+
+    def qsize(self):
+        return self._size
+
+    def empty(self):
+        return self._size == 0
+
+    def group_stats(self):
+        return {
+            name: {"queued": len(group.heap), "weight": group.weight, "dispatched": group.dispatched}
+            for name, group in self._groups.items()
+        }
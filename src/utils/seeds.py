@@ -0,0 +1,100 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import time
+from pathlib import Path
+from utils.helper import get_sheet_id_from_url, get_sheet_gviz_url, iter_sheet_urls
+from utils.network import AsyncHttpClient
+
+
+class SeedSource:
+    # Async iterable of seed URLs, read lazily so the worker only pulls as much as it can queue
+    def __aiter__(self):
+        return self.urls()
+
+    async def urls(self):
+        raise NotImplementedError
+        yield
+
+
+class FileSeeds(SeedSource):
+    # Plain text (one URL per line), JSONL (field holds the URL) or either of them gzipped
+    def __init__(self, path, field="url", yield_every=1000):
+        self._path = Path(path)
+        self._field = field
+        self._yield_every = yield_every
+        self.skipped = 0
+
+    def _open(self):
+        if self._path.suffix == ".gz":
+            return gzip.open(self._path, "rt", encoding="utf-8")
+        return self._path.open("r", encoding="utf-8")
+
+    def _is_jsonl(self):
+        suffixes = self._path.suffixes
+        return ".jsonl" in suffixes or ".ndjson" in suffixes
+
+    def _parse_jsonl(self, line, line_number):
+        # One malformed line (a truncated write, a stray log line) is skipped instead of ending the crawl
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            record = None
+            error = str(e)
+        else:
+            error = "not a JSON object"
+        if not isinstance(record, dict):
+            self.skipped += 1
+            print(f"Skipping {self._path}:{line_number}: {error}")
+            return None
+        return record.get(self._field)
+
+    async def urls(self):
+        is_jsonl = self._is_jsonl()
+        with self._open() as file:
+            for count, line in enumerate(file, 1):
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    url = self._parse_jsonl(line, count) if is_jsonl else line
+                    if url:
+                        yield url
+                if count % self._yield_every == 0:
+                    await asyncio.sleep(0)
+
+
+class SheetSeeds(SeedSource):
+    # First-column URLs of a public Google Sheet; the gviz response is cached on disk for cache_ttl seconds
+    def __init__(self, sheet_url, cache_dir=".seed_cache", cache_ttl=3600, client: AsyncHttpClient = None):
+        self._sheet_url = sheet_url
+        self._cache_dir = Path(cache_dir) if cache_dir else None
+        self._cache_ttl = cache_ttl
+        self._client = client
+
+    def _cache_path(self, sheet_id):
+        return self._cache_dir / f"sheet_{hashlib.sha1(sheet_id.encode()).hexdigest()[:16]}.json"
+
+    async def _fetch(self, sheet_id):
+        cache_path = self._cache_path(sheet_id) if self._cache_dir else None
+        if cache_path and cache_path.exists() and time.time() - cache_path.stat().st_mtime < self._cache_ttl:
+            return cache_path.read_text(encoding="utf-8")
+
+        client = self._client or AsyncHttpClient(retries=2)
+        try:
+            data, status = await client.get(get_sheet_gviz_url(sheet_id))
+        finally:
+            if self._client is None:
+                await client.close()
+        if status != 200:
+            return ""
+        if cache_path:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            cache_path.write_text(data, encoding="utf-8")
+        return data
+
+    async def urls(self):
+        sheet_id = get_sheet_id_from_url(self._sheet_url)
+        if not sheet_id:
+            return
+        for url in iter_sheet_urls(await self._fetch(sheet_id)):
+            yield url
@@ -0,0 +1,195 @@
+import asyncio
+import multiprocessing
+import os
+import queue as queue_lib
+import zlib
+from models import Proxy, Task
+from utils.sink import ResultSink
+from utils.urls import get_host
+
+_STOP = None
+
+
+def shard_for(task: Task, num_shards):
+    host = get_host(task.url) if task.url else ""
+    return zlib.crc32(host.encode("utf-8")) % num_shards
+
+
+class _PipeSink(ResultSink):
+    def __init__(self, shard_id, outbox, **kwargs):
+        super().__init__(**kwargs)
+        self._shard_id = shard_id
+        self._outbox = outbox
+
+    def write_batch(self, results):
+        self._outbox.put(("results", self._shard_id, results))
+
+
+async def _shard_main(shard_id, num_shards, inbox, outbox, worker_kwargs, proxies):
+    from utils.worker import BrowserWorker
+    from utils.proxy import ProxyManager, StaticProxies
+
+    loop = asyncio.get_running_loop()
+    sink = _PipeSink(shard_id, outbox)
+
+    def route(task):
+        # Children for hosts owned by another shard go back through the parent
+        if shard_for(task, num_shards) == shard_id:
+            return False
+        outbox.put(("route", shard_id, task.to_record()))
+        return True
+
+    # The parent fetched and validated the pool once; each shard only keeps its own health stats over it
+    proxy_manager = ProxyManager(StaticProxies(Proxy(**proxy) for proxy in proxies)) if proxies is not None else None
+    worker = BrowserWorker(**worker_kwargs, proxy_manager=proxy_manager, sink=sink, router=route)
+    await worker.start()
+
+    received = 0
+    arrived = asyncio.Event()
+
+    async def report_idle():
+        while True:
+            await arrived.wait()
+            arrived.clear()
+            # Only tasks received before join() started are covered by this idle report
+            snapshot = received
+            await worker.wait_for_completion()
+            await sink.flush()
+            outbox.put(("idle", shard_id, snapshot))
+
+    reporter = asyncio.create_task(report_idle())
+    while True:
+        record = await loop.run_in_executor(None, inbox.get)
+        if record is _STOP:
+            break
+        await worker._spawn(Task.from_record(*record))
+        received += 1
+        arrived.set()
+
+    reporter.cancel()
+    await worker.stop()
+    await sink.close()
+    failed = [(task.to_record(), error) for task, error in worker.get_failed_tasks()]
+    health = proxy_manager.export_health() if proxy_manager else {}
+    if proxy_manager:
+        await proxy_manager.close()
+    outbox.put(("done", shard_id, {"failed": failed, "proxies": health}))
+
+
+def _shard_process(shard_id, num_shards, inbox, outbox, worker_kwargs, proxies):
+    asyncio.run(_shard_main(shard_id, num_shards, inbox, outbox, worker_kwargs, proxies))
+
+
+class ShardedBrowserWorker:
+    # Runs one BrowserWorker (own event loop, own browsers) per process; tasks are routed by host hash
+    def __init__(self, num_processes=None, use_proxies=False, **worker_kwargs):
+        self._num_processes = num_processes or os.cpu_count() or 1
+        self._use_proxies = use_proxies
+        self._worker_kwargs = worker_kwargs
+        self._results = []
+        self._failed_tasks = []
+        self._proxy_health = {}
+
+    async def _fetch_proxies(self):
+        # Fetched and health-checked here, once, instead of by every shard at the same time
+        if not self._use_proxies:
+            return None
+        from utils.proxy import FreeProxy
+
+        free_proxy = FreeProxy()
+        try:
+            return [proxy.model_dump() for proxy in await free_proxy.get_proxies()]
+        finally:
+            await free_proxy.close()
+
+    def _merge_proxy_health(self, health):
+        for key, stats in health.items():
+            merged = self._proxy_health.get(key)
+            if merged is None:
+                self._proxy_health[key] = {**stats, "shards": 1}
+                continue
+            shards = merged["shards"]
+            merged["success_rate"] = (merged["success_rate"] * shards + stats["success_rate"]) / (shards + 1)
+            merged["latency"] = (merged["latency"] * shards + stats["latency"]) / (shards + 1)
+            merged["failures"] += stats["failures"]
+            merged["cooling_down"] = merged["cooling_down"] or stats["cooling_down"]
+            merged["shards"] = shards + 1
+
+    async def run_tasks(self, tasks):
+        loop = asyncio.get_running_loop()
+        context = multiprocessing.get_context("spawn")
+        num_shards = self._num_processes
+        inboxes = [context.Queue() for _ in range(num_shards)]
+        outbox = context.Queue()
+        proxies = await self._fetch_proxies()
+        processes = [
+            context.Process(
+                target=_shard_process,
+                args=(shard_id, num_shards, inboxes[shard_id], outbox, self._worker_kwargs, proxies),
+                daemon=True,
+            )
+            for shard_id in range(num_shards)
+        ]
+        for process in processes:
+            process.start()
+
+        sent = [0] * num_shards
+        idle = [0] * num_shards
+
+        def dispatch(handle_ref, payload):
+            shard_id = shard_for(Task.from_record(handle_ref, payload), num_shards)
+            sent[shard_id] += 1
+            inboxes[shard_id].put((handle_ref, payload))
+
+        if hasattr(tasks, "__aiter__"):
+            async for task in tasks:
+                dispatch(*task.to_record())
+        else:
+            for task in tasks:
+                dispatch(*task.to_record())
+
+        finished = set()
+
+        def next_message():
+            # Short timeout so a crashed shard is noticed instead of blocking forever
+            while True:
+                try:
+                    return outbox.get(timeout=1.0)
+                except queue_lib.Empty:
+                    for shard_id, process in enumerate(processes):
+                        if shard_id not in finished and not process.is_alive():
+                            raise RuntimeError(f"Shard {shard_id} exited unexpectedly")
+
+        done = 0
+        stopping = False
+        while done < num_shards:
+            if not stopping and idle == sent:
+                stopping = True
+                for inbox in inboxes:
+                    inbox.put(_STOP)
+
+            kind, shard_id, payload = await loop.run_in_executor(None, next_message)
+            if kind == "results":
+                self._results.extend(payload)
+            elif kind == "route":
+                dispatch(*payload)
+            elif kind == "idle":
+                idle[shard_id] = payload
+            elif kind == "done":
+                done += 1
+                finished.add(shard_id)
+                self._failed_tasks.extend((Task.from_record(*record), error) for record, error in payload["failed"])
+                self._merge_proxy_health(payload["proxies"])
+
+        for process in processes:
+            await loop.run_in_executor(None, process.join)
+
+    async def get_results(self):
+        results, self._results = self._results, []
+        return results
+
+    def get_failed_tasks(self):
+        return self._failed_tasks
+
+    def get_proxy_health(self):
+        return self._proxy_health
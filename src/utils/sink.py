@@ -0,0 +1,171 @@
+import asyncio
+import gzip
+import json
+from pathlib import Path
+from utils.retry import PermanentError
+
+_CLOSE = object()
+
+
+# Permanent so the worker fails the task instead of retrying a result that can't be written either way
+class SinkError(PermanentError):
+    pass
+
+
+class ResultSink:
+    # Results go through a bounded buffer: when the writer falls behind, put() blocks the workers
+    def __init__(self, max_buffer=1000, batch_size=200, flush_interval=1.0):
+        self._max_buffer = max_buffer
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._queue = None
+        self._consumer = None
+        self._error = None
+        self.written = 0
+        self.dropped = 0
+
+    async def start(self):
+        if self._consumer is None:
+            self._queue = asyncio.Queue(maxsize=self._max_buffer)
+            self._consumer = asyncio.create_task(self._consume())
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise SinkError(f"Writing results failed, {self.dropped} dropped: {self._error!r}") from self._error
+
+    async def put(self, result):
+        self._raise_error()
+        await self.start()
+        await self._queue.put(result)
+
+    async def _next_batch(self):
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._flush_interval
+        while len(batch) < self._batch_size and batch[-1] is not _CLOSE:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+        return batch
+
+    async def _consume(self):
+        while True:
+            batch = await self._next_batch()
+            closing = batch[-1] is _CLOSE
+            results = batch[:-1] if closing else batch
+            try:
+                if results:
+                    # File and encoder work runs off the event loop so workers keep crawling
+                    await asyncio.to_thread(self.write_batch, results)
+                    self.written += len(results)
+            except Exception as e:
+                # The consumer keeps draining so blocked put() calls wake up and raise instead of hanging
+                self._error = self._error or e
+                self.dropped += len(results)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if closing:
+                return
+
+    async def flush(self):
+        if self._queue is not None:
+            await self._queue.join()
+        self._raise_error()
+
+    async def close(self):
+        if self._consumer is not None:
+            await self._queue.put(_CLOSE)
+            await self._consumer
+            self._consumer = None
+        await asyncio.to_thread(self.close_output)
+        self._raise_error()
+
+    def write_batch(self, results):
+        raise NotImplementedError
+
+    def close_output(self):
+        pass
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+class JsonlSink(ResultSink):
+    def __init__(self, path, compress=None, **kwargs):
+        super().__init__(**kwargs)
+        self._path = Path(path)
+        self._compress = self._path.suffix == ".gz" if compress is None else compress
+        self._file = None
+
+    def write_batch(self, results):
+        if self._file is None:
+            if self._compress:
+                self._file = gzip.open(self._path, "at", encoding="utf-8")
+            else:
+                self._file = self._path.open("a", encoding="utf-8")
+        self._file.write("".join(json.dumps(result, default=str) + "\n" for result in results))
+        self._file.flush()
+
+    def close_output(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ParquetSink(ResultSink):
+    # Columnar output; each batch becomes a row group. Needs the optional pyarrow dependency
+    def __init__(self, path, **kwargs):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError("ParquetSink requires pyarrow: pip install pyarrow") from e
+        super().__init__(**kwargs)
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self._path = str(path)
+        self._writer = None
+
+    def write_batch(self, results):
+        if self._writer is None:
+            table = self._pa.Table.from_pylist(results)
+            self._writer = self._pq.ParquetWriter(self._path, table.schema)
+        else:
+            table = self._pa.Table.from_pylist(results, schema=self._writer.schema)
+        self._writer.write_table(table)
+
+    def close_output(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class ExcelSink(ResultSink):
+    # Streams dict results into a write-only workbook, one column per header
+    def __init__(self, path, headers, sheet_name="results", row=None, max_rows=None, rollover="sheet", **kwargs):
+        from utils.helper import ExcelStreamWriter, EXCEL_MAX_ROWS
+        super().__init__(**kwargs)
+        self._row = row or (lambda result: [result.get(header) for header in headers])
+        self._writer = ExcelStreamWriter(path, sheet_name, headers, max_rows=max_rows or EXCEL_MAX_ROWS, rollover=rollover)
+        self.files = []
+
+    def write_batch(self, results):
+        for result in results:
+            self._writer.append(self._row(result))
+
+    def close_output(self):
+        if self._writer is not None:
+            self.files = self._writer.close()
+            self._writer = None
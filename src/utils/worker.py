@@ -1,146 +1,755 @@
-import urllib3
-from camoufox.async_api import AsyncCamoufox
-from browserforge.fingerprints import Screen
 import asyncio
+import random
 import re
-from utils.proxy import ProxyManager
+import time
+from contextlib import AsyncExitStack
+from utils.pool import BrowserPool
+from utils.scheduler import FifoTaskQueue
+from utils.fetch import HttpPage, EscalateToBrowser, visible_text
+from utils.network import AsyncHttpClient
+from utils.urls import get_host
+from utils.metrics import Metrics
+from utils.intercept import InterceptPolicy, InterceptStats, install_policy
+from utils.retry import DelayQueue, ErrorClass, NoProxyAvailable, TaskTimeout, classify_error, default_policies
+from utils import frontier
 from models import Task,Proxy
 from typing import List
 
-# Disable insecure request warnings
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+def camoufox_factory(**config):
+    # Camoufox is imported on first launch so the worker can run against other backends without it
+    import urllib3
+    from camoufox.async_api import AsyncCamoufox
+    from browserforge.fingerprints import Screen
+
+    # Disable insecure request warnings
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    if isinstance(config.get("screen"), dict):
+        config["screen"] = Screen(**config["screen"])
+    return AsyncCamoufox(**config)
+
+
+# Returned in place of a result when the page was a suppressed near-duplicate
+_SUPPRESSED = object()
+# Proxy protocols aiohttp can tunnel through, for the HTTP tier and recrawl checks
+_HTTP_PROXY_PROTOCOLS = ("http", "https")
+
+
+def _proxy_label(proxy):
+    return f"{proxy.ip}:{proxy.port}" if proxy else None
 
 
 class _BrowserWorkerLogger:
+    # Per-task chatter is sampled; errors and state changes are always printed unless logging is off
+    def __init__(self, enabled=True, sample_rate=1.0):
+        self.enabled = enabled
+        self._sample_rate = sample_rate
+
+    def _sampled(self):
+        return self.enabled and (self._sample_rate >= 1.0 or random.random() < self._sample_rate)
     
     def worker_processing(self, worker_id, task_id):
-        print(f"Worker {worker_id} processing task {task_id}")
+        if self._sampled():
+            print(f"Worker {worker_id} processing task {task_id}")
         
     def worker_completion(self, worker_id, task_id):
-        print(f"Worker {worker_id} completed task {task_id}")
+        if self._sampled():
+            print(f"Worker {worker_id} completed task {task_id}")
         
     def worker_error(self, worker_id, task_id, error):
-        print(f"Worker {worker_id} encountered an error processing task {task_id}: {error}")
+        if self.enabled:
+            print(f"Worker {worker_id} encountered an error processing task {task_id}: {error}")
         
     def adding_proxy_to_blacklist(self, proxy:Proxy):
-        print(f"Adding proxy {proxy.ip}:{proxy.port} to blacklist")
+        if self.enabled:
+            print(f"Adding proxy {proxy.ip}:{proxy.port} to blacklist")
         
-    def worker_retry(self, worker_id, task_id, retry_count, max_retries):
-        print(f"Worker {worker_id} retrying task {task_id} (attempt {retry_count}/{max_retries})")
+    def worker_retry(self, worker_id, task_id, retry_count, max_retries, error_class, delay):
+        if self._sampled():
+            print(f"Worker {worker_id} retrying task {task_id} in {delay:.1f}s "
+                  f"({error_class.value} error, attempt {retry_count}/{max_retries})")
         
-    def worker_failed(self, worker_id, task_id, max_retries):
-        print(f"Worker {worker_id}: Task {task_id} failed after {max_retries} attempts")
+    def worker_failed(self, worker_id, task_id, attempts, error_class):
+        if self.enabled:
+            print(f"Worker {worker_id}: Task {task_id} failed after {attempts} attempts ({error_class.value} error)")
         
     def create_task(self, task_id):
-        print(f"Created task with id: {task_id}")
+        if self._sampled():
+            print(f"Created task with id: {task_id}")
 
     def worker_proxy_not_connected(self, proxy:Proxy):
-        print(f"Worker proxy not connected: {proxy.ip}:{proxy.port}")
+        if self.enabled:
+            print(f"Worker proxy not connected: {proxy.ip}:{proxy.port}")
+
+    def task_depth_exceeded(self, task_id, depth, max_depth):
+        if self._sampled():
+            print(f"Dropping task {task_id}: depth {depth} exceeds max depth {max_depth}")
+
+    def task_duplicate(self, task_id, url):
+        if self._sampled():
+            print(f"Skipping task {task_id}: {url} was already seen")
+
+    def task_escalated(self, task_id, host, reason):
+        if self.enabled:
+            print(f"Task {task_id} needs a browser ({reason}); routing {host} to the browser tier")
+
+    def task_unchanged(self, worker_id, task_id, url):
+        if self._sampled():
+            print(f"Worker {worker_id} skipping task {task_id}: {url} has not changed")
+
+    def task_near_duplicate(self, task_id, url, original):
+        if self._sampled():
+            print(f"Task {task_id}: {url} is a near-duplicate of {original}")
+
+    def task_pattern_skipped(self, task_id, url):
+        if self._sampled():
+            print(f"Skipping task {task_id}: {url} matches a pattern that keeps producing duplicates")
+
+    def task_soft_deadline(self, task_id, soft_timeout):
+        if self.enabled:
+            print(f"Task {task_id} hit its {soft_timeout}s soft deadline; returning its partial result")
+
+    def task_cleanup_stuck(self, task_id, cleanup_timeout):
+        if self.enabled:
+            print(f"Task {task_id} did not finish cleaning up {cleanup_timeout}s after cancellation")
+
+    def worker_hung(self, worker_id, task_id, elapsed):
+        if self.enabled:
+            print(f"Worker {worker_id} hung on task {task_id} for {elapsed:.0f}s; killing and replacing it")
+
+    def run_deadline(self, timeout, remaining):
+        if self.enabled:
+            print(f"Run deadline of {timeout}s reached with {remaining} tasks still queued; stopping")
+
+    def concurrency_changed(self, previous, limit, reason):
+        if self.enabled:
+            print(f"Active workers {previous} -> {limit}" + (f" ({reason})" if reason else ""))
+
+    def browser_recycled(self, worker_id, tasks):
+        if self.enabled:
+            print(f"Worker {worker_id} recycling browser after {tasks} tasks")
 
 
 class BrowserWorker:
-    def __init__(self, num_workers=3, max_retries=5, show_browser=False, proxy_manager=None):
-        self._tasks = asyncio.Queue()
+    def __init__(self, num_workers=3, max_retries=5, show_browser=False, proxy_manager=None,
+                 pool=False, recycle_after=50, max_depth=None, seen=None, queue=None,
+                 store=None, fetch_mode="browser", fetch_rules=None, sink=None,
+                 metrics=None, log=True, log_sample_rate=1.0, browser_factory=None,
+                 router=None, concurrency=None, retry_policies=None, intercept=None,
+                 cache=None, recrawl=None, dedup=None, dedup_mode="flag", identities=None, max_total_retries=None, http_client=None,
+                 task_timeout=None, soft_timeout=None, watchdog_timeout=None, cleanup_timeout=30):
+        # Durable store (store.SqliteStore) for tasks, results and failures; also the task queue unless one is given
+        self._store = store
+        # Streaming result sink (utils.sink.JsonlSink, ParquetSink, ...); results are written as they arrive
+        self._sink = sink
+        # Any task queue with put/get/task_done(task)/join/empty/qsize, e.g. utils.scheduler.HostScheduler;
+        # an optional release(task) frees per-host capacity while a retry waits out its backoff
+        if queue is not None:
+            self._tasks = queue
+        elif store is not None:
+            self._tasks = store
+        else:
+            self._tasks = FifoTaskQueue()
         self._results = asyncio.Queue()  # Changed from list to queue
-        self._num_workers = num_workers
+        # utils.concurrency.AdaptiveConcurrency; max_workers coroutines run, only `limit` of them take tasks
+        self._concurrency = concurrency
+        self._concurrency_changed = asyncio.Event()
+        self._controller = None
+        self._num_workers = concurrency.max_workers if concurrency else num_workers
         self._workers = []
         self._failed_tasks = []
         self._max_retries = max_retries
-        self._retry_counts = {}
-        self._logger = _BrowserWorkerLogger()
+        # Backoff per utils.retry.ErrorClass; entries given here override the defaults derived from max_retries
+        self._retry_policies = {**default_policies(max_retries), **(retry_policies or {})}
+        # Optional cap on retries across all error classes together
+        self._max_total_retries = max_total_retries
+        # Tasks waiting out a backoff sit here, not in the task queue, so workers never pick them up early
+        self._delayed = DelayQueue()
+        self._logger = _BrowserWorkerLogger(enabled=log, sample_rate=log_sample_rate)
+        self._metrics = metrics if metrics is not None else Metrics()
         self._show_browser = show_browser
+        # Callable(**config) returning an async context manager that yields a browser; Camoufox by default
+        self._browser_factory = browser_factory or camoufox_factory
         self._proxy_manager = proxy_manager
+        # Pool mode keeps one long-lived browser per worker and opens a fresh context per task
+        self._pool = BrowserPool(recycle_after=recycle_after) if pool else None
+        self._max_depth = max_depth
+        # "tiered" tries a plain HTTP fetch first and escalates to the browser only when a rule fires
+        self._fetch_mode = fetch_mode
+        self._fetch_rules = fetch_rules
+        # utils.network.AsyncHttpClient for the HTTP tier and recrawl checks; pass the same one to FreeProxy(client=)
+        # and SheetSeeds(client=) to share one connection pool. Only a client the worker created is closed by stop()
+        self._http_client = http_client
+        self._owns_http_client = http_client is None
+        self._browser_hosts = set()
+        self._capacity_freed = asyncio.Event()
+        # Seen-URL index (utils.urls.UrlSet or BloomFilter) shared by seeds and emitted children
+        self._seen = seen
+        # Callable(task) -> True when the task was handed off elsewhere (e.g. to another shard) instead of queued here
+        self._router = router
+        # utils.intercept.InterceptPolicy applied to every browser page; Task.intercept overrides it per task
+        self._intercept = intercept
+        self._intercept_stats = InterceptStats(self._metrics)
+        # utils.cache.ResourceCache serving repeated static subresources (and optionally documents) from disk
+        self._cache = cache
+        # store.RecrawlIndex: known pages are checked with a conditional GET first and only rendered when they changed;
+        # validators and hashes are recorded from the render's own response
+        self._recrawl = recrawl
+        self._recrawl_observed = {}
+        # utils.dedup.NearDuplicateIndex checked after the handler; "flag" adds duplicate_of to dict results,
+        # "suppress" drops the result. URL patterns it learns to be duplicate-only are skipped before fetching
+        self._dedup = dedup
+        self._dedup_mode = dedup_mode
+        # utils.identity.IdentityCache: fingerprint and GeoIP exit IP generated once per proxy instead of per launch
+        self._identities = identities
+        # Default deadlines for tasks without Task.timeout / Task.soft_timeout
+        self._task_timeout = task_timeout
+        self._soft_timeout = soft_timeout
+        # How long a cancelled task (or stop()) may take to close its browser
+        self._cleanup_timeout = cleanup_timeout
+        # Workers stuck on one task longer than this are reported, their task failed and the worker replaced
+        if watchdog_timeout is None and task_timeout:
+            watchdog_timeout = task_timeout + 2 * cleanup_timeout
+        self._watchdog_timeout = watchdog_timeout
+        self._watchdog = None
+        self._active = {}
+        self._killed = set()
     
     async def _worker(self, worker_id):
+        metrics = self._metrics
         while True:
+            await self._wait_for_slot(worker_id)
             task = await self._tasks.get()
+            self._capacity_freed.set()
+            metrics.set_gauge("queue_depth", self._tasks.qsize())
+            host = get_host(task.url) if task.url else None
 
+            scope, token = frontier.open_scope(task)
+            used_proxy = None
+            deferred = False
+            started = time.monotonic()
+            self._active[worker_id] = (task, started)
             try:
                 self._logger.worker_processing(worker_id, task.id)
-                result, used_proxy = await self._run_task(task.handle, task.args)
-                await self._results.put(result)  # Put result in queue instead of list
+                check = await self._check_recrawl(task, started)
+                if check is not None and check.unchanged:
+                    self._recrawl.commit(check)
+                    metrics.inc("tasks_total", status="unchanged", worker=worker_id, host=host)
+                    self._logger.task_unchanged(worker_id, task.id, task.url)
+                    continue
+                with metrics.span("task", worker=worker_id):
+                    result, used_proxy = await self._run_with_deadlines(task, worker_id, scope, started)
+                if task.id in self._killed:
+                    # The watchdog gave up on this worker and already failed the task
+                    continue
+                latency = time.monotonic() - started
+                if self._concurrency:
+                    self._concurrency.record(latency, True)
+                if result is _SUPPRESSED:
+                    metrics.inc("tasks_total", status="duplicate", worker=worker_id, host=host)
+                else:
+                    await self._put_result(result)
+                observed = self._recrawl_observed.pop(task.id, None) or check
+                if observed is not None and not scope.soft_expired:
+                    self._recrawl.commit(observed)
+                # Children are queued before this task is marked done, so join() only returns once the frontier is empty
+                for child in scope.children:
+                    await self._spawn(child)
                 if self._proxy_manager:
-                     self._proxy_manager.add_to_whitelist(used_proxy)  # Add proxy to whitelist if it worked
+                     self._proxy_manager.add_to_whitelist(used_proxy, latency)  # Feeds the proxy's success rate and latency
+                metrics.inc("tasks_total", status="success", worker=worker_id, host=host)
+                if used_proxy:
+                    metrics.observe("proxy_task_seconds", latency, proxy=_proxy_label(used_proxy))
                 self._logger.worker_completion(worker_id, task.id)
+            except asyncio.CancelledError:
+                # Stopped mid-task: leave it unfinished so a durable store hands it out again
+                deferred = True
+                raise
             except Exception as e:
+                if self._concurrency:
+                    self._concurrency.record(time.monotonic() - started, False)
                 self._logger.worker_error(worker_id, task.id, str(e))
-                retry_count = self._retry_counts.get(task.id, 0)+1
-                
-                if retry_count <= self._max_retries:
-                    self._retry_counts[task.id] = retry_count
-                    self._logger.worker_retry(worker_id, task.id, retry_count, self._max_retries)
-                    await self._tasks.put(task)
+                error_class = classify_error(e)
+                policy = self._retry_policies[error_class]
+                # Attempt counts live on the task so a durable store keeps them across restarts; each error class
+                # is held to its own budget and backs off from its own count
+                retry_count = task.attempts_by_class.get(error_class.value, 0) + 1
+                within_total = self._max_total_retries is None or task.attempts < self._max_total_retries
+
+                if retry_count <= policy.max_retries and within_total:
+                    task.attempts += 1
+                    task.attempts_by_class[error_class.value] = retry_count
+                    delay = policy.delay(retry_count)
+                    metrics.inc("tasks_total", status="retry", worker=worker_id, host=host, error=error_class.value)
+                    self._logger.worker_retry(worker_id, task.id, retry_count, policy.max_retries, error_class, delay)
+                    # task_done waits until the retry is back in the queue, so join() doesn't return during the backoff,
+                    # but a host-aware queue gets the task's slot back now so other tasks for that host keep going
+                    release = getattr(self._tasks, "release", None)
+                    if release is not None:
+                        release(task)
+                    self._delayed.schedule(task, delay, self._release_retry)
+                    metrics.set_gauge("retry_backlog", len(self._delayed))
+                    deferred = True
                 else:
-                    self._logger.worker_failed(worker_id, task.id, self._max_retries)
-                    self._failed_tasks.append((task, str(e)))
+                    metrics.inc("tasks_total", status="failed", worker=worker_id, host=host, error=error_class.value)
+                    self._logger.worker_failed(worker_id, task.id, task.attempts + 1, error_class)
+                    self._record_failure(task, str(e))
             finally:
-                self._tasks.task_done()
+                frontier.close_scope(token)
+                self._recrawl_observed.pop(task.id, None)
+                if self._active.get(worker_id, (None,))[0] is task:
+                    del self._active[worker_id]
+                if task.id in self._killed:
+                    self._killed.discard(task.id)
+                elif not deferred:
+                    self._tasks.task_done(task)
+
+    def _time_left(self, limit, started):
+        return max(limit - (time.monotonic() - started), 0.0)
+
+    async def _run_with_deadlines(self, task: Task, worker_id, scope, started):
+        # Deadlines count from when the worker picked the task up, so the recrawl pre-check uses up budget too
+        timeout = task.timeout or self._task_timeout
+        soft_timeout = task.soft_timeout or self._soft_timeout
+        if not timeout and not soft_timeout:
+            return await self._run_task(task, worker_id)
+        if timeout and not self._time_left(timeout, started):
+            self._metrics.inc("tasks_timed_out_total")
+            raise TaskTimeout(f"Task {task.id} exceeded its {timeout}s deadline")
+        run = asyncio.ensure_future(self._run_task(task, worker_id))
+        try:
+            if soft_timeout and (not timeout or soft_timeout < timeout):
+                done, _ = await asyncio.wait({run}, timeout=self._time_left(soft_timeout, started))
+                if not done and scope.has_partial:
+                    await self._cancel_run(run, task)
+                    scope.soft_expired = True
+                    self._metrics.inc("tasks_partial_total")
+                    self._logger.task_soft_deadline(task.id, soft_timeout)
+                    result = scope.partial
+                    return ({**result, "partial": True} if isinstance(result, dict) else result), None
+            done, _ = await asyncio.wait({run}, timeout=self._time_left(timeout, started) if timeout else None)
+            if not done:
+                await self._cancel_run(run, task)
+                self._metrics.inc("tasks_timed_out_total")
+                raise TaskTimeout(f"Task {task.id} exceeded its {timeout}s deadline")
+            return run.result()
+        finally:
+            # The worker itself was cancelled (stop() or the watchdog)
+            if not run.done():
+                run.cancel()
+
+    async def _cancel_run(self, run, task: Task):
+        # Cancellation unwinds the handler through the browser's async context managers, which close it
+        run.cancel()
+        done, _ = await asyncio.wait({run}, timeout=self._cleanup_timeout)
+        if not done:
+            self._logger.task_cleanup_stuck(task.id, self._cleanup_timeout)
+        elif not run.cancelled():
+            run.exception()
+
+    async def _watch_workers(self):
+        while True:
+            await asyncio.sleep(max(1.0, self._watchdog_timeout / 4))
+            now = time.monotonic()
+            for worker_id, (task, started) in list(self._active.items()):
+                limit = max(self._watchdog_timeout, (task.timeout or 0) + 2 * self._cleanup_timeout)
+                if now - started > limit:
+                    self._kill_worker(worker_id, task, now - started)
+
+    def _kill_worker(self, worker_id, task: Task, elapsed):
+        self._logger.worker_hung(worker_id, task.id, elapsed)
+        self._metrics.inc("workers_killed_total", worker=worker_id)
+        self._record_failure(task, f"Worker hung for {elapsed:.0f}s and was killed by the watchdog")
+        del self._active[worker_id]
+        # The task is finished here because a truly stuck worker may never unwind far enough to do it itself
+        self._killed.add(task.id)
+        self._tasks.task_done(task)
+        self._workers[worker_id - 1].cancel()
+        self._workers[worker_id - 1] = asyncio.create_task(self._worker(worker_id))
+
+    async def _release_retry(self, task: Task):
+        await self._tasks.put(task)
+        self._tasks.task_done(task)
+        self._metrics.set_gauge("retry_backlog", len(self._delayed))
     
+    async def _wait_for_slot(self, worker_id):
+        while self._concurrency and worker_id > self._concurrency.limit:
+            self._concurrency_changed.clear()
+            await self._concurrency_changed.wait()
+
+    async def _control_concurrency(self):
+        while True:
+            await asyncio.sleep(self._concurrency.interval)
+            previous = self._concurrency.limit
+            limit = self._concurrency.adjust()
+            self._metrics.set_gauge("active_workers", limit)
+            if limit != previous:
+                self._logger.concurrency_changed(previous, limit, self._concurrency.last_reason)
+                self._concurrency_changed.set()
+
+    async def _put_result(self, result):
+        if self._sink is not None:
+            await self._sink.put(result)
+        elif self._store is not None:
+            await self._store.add_result(result)
+        else:
+            await self._results.put(result)  # Put result in queue instead of list
+
+    def _record_failure(self, task: Task, error):
+        if self._store is not None:
+            self._store.fail(task, error)
+        else:
+            self._failed_tasks.append((task, error))
+
     async def _add_task(self, task: Task):
         self._logger.create_task(task.id)
         await self._tasks.put(task)
         return task.id
+
+    async def _spawn(self, task: Task):
+        if self._max_depth is not None and task.depth > self._max_depth:
+            self._logger.task_depth_exceeded(task.id, task.depth, self._max_depth)
+            return None
+        if self._router is not None and self._router(task):
+            return None
+        if self._dedup is not None and task.url and self._dedup.should_skip(task.url):
+            self._logger.task_pattern_skipped(task.id, task.url)
+            self._metrics.inc("tasks_skipped_total", reason="duplicate_pattern")
+            return None
+        if self._seen is not None and task.url and not self._seen.add(task.url):
+            self._logger.task_duplicate(task.id, task.url)
+            return None
+        return await self._add_task(task)
     
-    async def _run_task(self, handle, args):
-        proxy=None
+    def _browser_config(self, proxy=None):
         config={
             "i_know_what_im_doing":True,
             "geoip":True,
             "os":('windows','macos', 'linux'),
-            "screen":Screen(max_width=1920, max_height=3200),
+            "screen":{"max_width":1920, "max_height":3200},
             "humanize":True,
             "block_images":True,
             "headless":not self._show_browser,
             "timeout":5000
         }
-       
-        if self._proxy_manager:
-            proxy = await self._proxy_manager.get_random_proxy()
+        if proxy:
             config["proxy"]=proxy.parse()
+        return config
+
+    async def _launch_config(self, proxy=None):
+        config = self._browser_config(proxy)
+        if self._identities is not None:
+            identity = await self._identities.get(proxy, os=config.pop("os"), screen=config.pop("screen"))
+            config["fingerprint"] = identity.fingerprint
+            # An IP instead of True lets Camoufox go straight to its local GeoIP database
+            config["geoip"] = identity.ip
+        return config
+
+    async def _get_proxy(self, protocols=None):
+        if self._proxy_manager:
+            with self._metrics.span("proxy_select"):
+                if protocols is None:
+                    return await self._proxy_manager.get_random_proxy()
+                return await self._proxy_manager.get_random_proxy(protocols=protocols)
+        return None
+
+    def _blacklist_proxy(self, proxy, error):
+        # Only failures the proxy is to blame for count against it; a broken handler or a 429 says nothing about it
+        if self._proxy_manager and proxy and classify_error(error) == ErrorClass.PROXY:
+            self._logger.adding_proxy_to_blacklist(proxy)
+            self._proxy_manager.add_to_blacklist(proxy)
+            self._metrics.inc("proxy_failures_total", proxy=_proxy_label(proxy))
 
-            
+    async def _run_task(self, task: Task, worker_id=None):
+        if self._fetch_mode == "tiered" and self._use_http_tier(task):
+            try:
+                return await self._run_http_task(task)
+            except EscalateToBrowser as e:
+                # The browser run starts over, so children and partial results of the HTTP attempt are dropped
+                frontier.reset_scope()
+                host = get_host(task.url)
+                if e.sticky:
+                    self._browser_hosts.add(host)
+                self._logger.task_escalated(task.id, host, str(e))
+
+        if self._pool:
+            return await self._run_pooled_task(task, worker_id)
+
+        proxy = await self._get_proxy()
         try:
-            async with AsyncCamoufox(
-              **config
-            ) as browser:
+            async with AsyncExitStack() as stack:
+                with self._metrics.span("browser_launch"):
+                    config = await self._launch_config(proxy)
+                    browser = await stack.enter_async_context(self._browser_factory(**config))
                 page = await browser.new_page()
-                result = await handle(page, *args)
+                result = await self._call_handler(task, page)
             return result, proxy
         except Exception as e:
-            self._logger.adding_proxy_to_blacklist(proxy)
-            self._proxy_manager.add_to_blacklist(proxy)
-            print(e)
+            self._blacklist_proxy(proxy, e)
             # Re-raise the exception to be handled by the caller
             raise
-    
+
+    def _instrument_page(self, page, responses=None):
+        goto = page.goto
+        metrics = self._metrics
+
+        async def timed_goto(*args, **kwargs):
+            with metrics.span("goto"):
+                response = await goto(*args, **kwargs)
+            if responses is not None and not responses:
+                responses.append(response)
+            return response
+
+        page.goto = timed_goto
+        return page
+
+    async def _call_handler(self, task: Task, page):
+        host = get_host(task.url) if task.url else None
+        responses = [] if self._recrawl is not None and task.url else None
+        self._instrument_page(page, responses)
+        if self._cache is not None and not isinstance(page, HttpPage):
+            # Routes run newest first: interception decides, then allowed requests fall back to the cache
+            await self._cache.install(page)
+        await self._intercept_page(task, page, host)
+        with self._metrics.span("handler"):
+            result = await task.handle(page, *task.args)
+        if responses:
+            await self._observe_recrawl(task, page, responses[0])
+        if self._dedup is not None and task.url:
+            result = await self._check_duplicate(task, page, result)
+        return result
+
+    async def _check_duplicate(self, task: Task, page, result):
+        try:
+            text = visible_text(await page.content())
+        except Exception:
+            # The handler may have closed or navigated the page away; nothing to fingerprint
+            return result
+        with self._metrics.span("dedup"):
+            original = self._dedup.check(task.url, text)
+        if original is None:
+            return result
+        self._logger.task_near_duplicate(task.id, task.url, original)
+        if self._dedup_mode == "suppress":
+            return _SUPPRESSED
+        if isinstance(result, dict):
+            result["duplicate_of"] = original
+        return result
+
+    async def _intercept_page(self, task: Task, page, host):
+        policy = self._intercept
+        if task.intercept is not None:
+            policy = policy.merged(task.intercept) if policy else InterceptPolicy(**task.intercept)
+        if policy is None or isinstance(page, HttpPage):
+            return
+        await install_policy(page, policy, self._intercept_stats, page_host=host)
+
+    def _use_http_tier(self, task: Task):
+        return bool(task.url) and not task.needs_browser and get_host(task.url) not in self._browser_hosts
+
+    def _get_http_client(self):
+        if self._http_client is None:
+            self._http_client = AsyncHttpClient(limit=self._num_workers * 4, retries=1)
+        return self._http_client
+
+    async def _observe_recrawl(self, task: Task, page, response):
+        # The first navigation's response; HttpPage (and the fake browser) return the page itself from goto()
+        if response is None:
+            return
+        try:
+            if response is page:
+                headers, html = getattr(page, "headers", None) or {}, await page.content()
+            else:
+                headers, html = response.headers, await response.text()
+            observed = self._recrawl.observe(task.url, response.status, headers, html)
+        except Exception:
+            # A redirect or a handler that closed the page leaves no body to record; the pre-check's is used instead
+            return
+        if observed is not None:
+            self._recrawl_observed[task.id] = observed
+
+    async def _check_recrawl(self, task: Task, started):
+        # URLs the index knows nothing about are rendered straight away and recorded from that response
+        if self._recrawl is None or not task.url or not self._recrawl.known(task.url):
+            return None
+        timeout = task.timeout or self._task_timeout
+        try:
+            proxy = await self._get_proxy(protocols=_HTTP_PROXY_PROTOCOLS)
+        except NoProxyAvailable:
+            return None
+        try:
+            with self._metrics.span("recrawl_check"):
+                check = self._recrawl.check(self._get_http_client(), task.url, proxy=proxy)
+                return await asyncio.wait_for(check, self._time_left(timeout, started) if timeout else None)
+        except Exception as e:
+            # The check is only an optimization; render the page as if there were no index. Running out of the
+            # task's own budget isn't the proxy's fault; the render then fails the task as a timeout
+            if not (timeout and isinstance(e, asyncio.TimeoutError) and not self._time_left(timeout, started)):
+                self._blacklist_proxy(proxy, e)
+            return None
+
+    async def _run_http_task(self, task: Task):
+        # aiohttp only speaks HTTP proxies; without one only this task goes through the browser, not its whole host
+        try:
+            proxy = await self._get_proxy(protocols=_HTTP_PROXY_PROTOCOLS)
+        except NoProxyAvailable as e:
+            raise EscalateToBrowser("no_http_proxy", sticky=False) from e
+        page = HttpPage(self._get_http_client(), proxy=proxy, rules=self._fetch_rules, cache=self._cache)
+        try:
+            result = await self._call_handler(task, page)
+        except EscalateToBrowser:
+            raise
+        except Exception as e:
+            self._blacklist_proxy(proxy, e)
+            raise
+        return result, proxy
+
+    async def _run_pooled_task(self, task: Task, worker_id):
+        slot = self._pool.slot(worker_id)
+        async with slot.lock:
+            if slot.is_open and self._pool.should_recycle(slot, self._proxy_manager):
+                self._logger.browser_recycled(worker_id, slot.tasks)
+                await self._pool.recycle(slot)
+            if not slot.is_open:
+                await self._launch_slot(slot)
+
+        proxy = slot.proxy
+        context = None
+        try:
+            context = await slot.browser.new_context()
+            page = await context.new_page()
+            result = await self._call_handler(task, page)
+            slot.tasks += 1
+            return result, proxy
+        except Exception as e:
+            # A blacklisted proxy or a disconnected browser makes the slot recycle on its next task
+            self._blacklist_proxy(proxy, e)
+            raise
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+
+    async def _launch_slot(self, slot):
+        proxy = await self._get_proxy()
+        with self._metrics.span("browser_launch"):
+            config = await self._launch_config(proxy)
+            await self._pool.open(slot, self._browser_factory(**config), proxy)
+
+    async def _prewarm_slot(self, slot):
+        async with slot.lock:
+            if not slot.is_open:
+                await self._launch_slot(slot)
+
+    async def prewarm(self, count=None):
+        # Launches pool browsers up front, e.g. while a slow seed source is still loading; a failed launch
+        # just leaves the slot for its worker to open as usual
+        if not self._pool:
+            return 0
+        count = min(count or self._num_workers, self._num_workers)
+        outcomes = await asyncio.gather(
+            *(self._prewarm_slot(self._pool.slot(worker_id)) for worker_id in range(1, count + 1)),
+            return_exceptions=True,
+        )
+        return sum(1 for outcome in outcomes if not isinstance(outcome, BaseException))
+
     async def start(self):
+        if self._sink is not None:
+            await self._sink.start()
         self._workers = []
         for i in range(self._num_workers):
             worker_task = asyncio.create_task(self._worker(i+1))
             self._workers.append(worker_task)
+        if self._concurrency:
+            self._metrics.set_gauge("active_workers", self._concurrency.limit)
+            self._controller = asyncio.create_task(self._control_concurrency())
+        if self._watchdog_timeout:
+            self._watchdog = asyncio.create_task(self._watch_workers())
     
     async def stop(self):
-        for worker in self._workers:
+        if self._watchdog:
+            self._watchdog.cancel()
+            self._watchdog = None
+        workers, self._workers = self._workers, []
+        for worker in workers:
             worker.cancel()
-        self._workers = []
+        if workers:
+            # Let cancelled tasks close their browsers before the pool and outputs are shut down
+            await asyncio.wait(workers, timeout=self._cleanup_timeout)
+        if self._controller:
+            self._controller.cancel()
+            self._controller = None
+        self._delayed.cancel()
+        if self._pool:
+            await self._pool.close()
+        if self._store is not None:
+            self._store.flush()
+        if self._http_client is not None and self._owns_http_client:
+            await self._http_client.close()
+            self._http_client = None
+        if self._sink is not None:
+            # Last, since it raises if any batch failed to write
+            await self._sink.flush()
     
     async def wait_for_completion(self):
         await self._tasks.join()
     
-    async def run_tasks(self, tasks: List[Task],wait_for_completion_additional=None):
+    async def _wait_for_capacity(self, max_pending):
+        while self._tasks.qsize() >= max_pending:
+            self._capacity_freed.clear()
+            await self._capacity_freed.wait()
+
+    async def run_tasks(self, tasks: List[Task],wait_for_completion_additional=None, max_pending=None, prewarm=False,
+                        timeout=None):
+        # timeout bounds the whole run; whatever is still queued or running then is left unfinished
         await self.start()
+        prewarming = asyncio.create_task(self.prewarm()) if prewarm else None
 
-        for task in tasks:
-            await self._add_task(task)
+        async def drain():
+            if hasattr(tasks, "__aiter__"):
+                # Lazy sources are only pulled as queue capacity frees up
+                pending_limit = max_pending or self._num_workers * 4
+                async for task in tasks:
+                    await self._wait_for_capacity(pending_limit)
+                    await self._spawn(task)
+            else:
+                for task in tasks:
+                    await self._spawn(task)
+            if prewarming is not None:
+                await prewarming
+            await self.wait_for_completion()
 
-        await self.wait_for_completion()
-        if wait_for_completion_additional:
-            await wait_for_completion_additional()
-        
-        await self.stop()
+        try:
+            await asyncio.wait_for(drain(), timeout)
+        except asyncio.TimeoutError:
+            self._logger.run_deadline(timeout, self._tasks.qsize())
+        else:
+            if wait_for_completion_additional:
+                await wait_for_completion_additional()
+        finally:
+            # Also on a failing seed source or handler hook, so no worker or browser outlives the run
+            if prewarming is not None and not prewarming.done():
+                prewarming.cancel()
+            await self.stop()
 
     
+    async def run_seeds(self, seeds, handle, max_pending=None, wait_for_completion_additional=None, prewarm=False,
+                        timeout=None):
+        async def seed_tasks():
+            async for url in seeds:
+                yield Task(handle=handle, args=[url], url=url)
+
+        await self.run_tasks(seed_tasks(), wait_for_completion_additional, max_pending=max_pending, prewarm=prewarm,
+                             timeout=timeout)
+
+    async def resume(self):
+        # Finish whatever a durable store still holds from a previous run
+        await self.run_tasks([])
+
     async def get_results(self):
+        if self._store is not None:
+            return await self._store.get_results()
         results = []
         while not self._results.empty():
             results.append(await self._results.get())
@@ -148,17 +757,46 @@ class BrowserWorker:
         return results
     
     async def get_result(self):
+        if self._store is not None:
+            return await self._store.get_result()
         if self._results.empty():
             return None
         result = await self._results.get()
         return result
     
     def get_failed_tasks(self):
+        if self._store is not None:
+            return self._store.get_failed_tasks()
         return self._failed_tasks
 
     def has_tasks(self):
         return not self._tasks.empty()
 
+    def get_metrics(self):
+        return self._metrics.snapshot()
+
+    def get_metrics_text(self):
+        return self._metrics.to_prometheus()
+
+    def get_intercept_report(self):
+        return self._intercept_stats.report()
+
+    def get_dedup_stats(self):
+        return self._dedup.stats() if self._dedup is not None else None
+
+    def get_identity_stats(self):
+        return self._identities.stats() if self._identities is not None else None
+
+    def get_recrawl_stats(self):
+        return self._recrawl.stats() if self._recrawl is not None else None
+
+    def get_cache_stats(self):
+        return self._cache.stats() if self._cache is not None else None
+
+    def get_pool_stats(self):
+        return self._pool.stats() if self._pool else None
+
+
 
 
 